@@ -0,0 +1,191 @@
+"""
+This file regrades a whole course export in one run.
+
+Each submission in the export directory has its own submission_metadata.json
+and results/results.json. The grading policy is loaded (and config.json
+validated) once, then the late-penalty and submission-cap pass is fanned out
+over a process pool. Each submission is rescored from its tests, so regrading
+an already processed export doesn't apply a penalty twice. A submission that
+can't be regraded gets a summary row with the error, and the rest still are.
+
+Usage:
+    python3 batch.py EXPORT_DIR [--source DIR] [--out DIR] [--summary PATH]
+                     [--workers N]
+"""
+
+import argparse
+import csv
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+from policy import load_policy
+from processor import SubmissionProcessor
+
+SUMMARY_FIELDS = [
+    "submission",
+    "emails",
+    "submission_count",
+    "days_late",
+    "raw_score",
+    "score",
+    "exceeded_limit",
+    "throttled",
+    "error",
+]
+
+# Set once per worker process by `_init_worker`
+_policy: dict[str, Any] = {}
+_out_dir = ""
+
+
+def find_submissions(export_dir: str) -> list[str]:
+    """Find every submission directory in a course export.
+
+    Args:
+        export_dir (str): The exported submissions directory.
+
+    Returns:
+        list[str]: The submission directory names, sorted.
+    """
+    return sorted(
+        name
+        for name in os.listdir(export_dir)
+        if os.path.isfile(os.path.join(export_dir, name, "submission_metadata.json"))
+        and os.path.isfile(os.path.join(export_dir, name, "results", "results.json"))
+    )
+
+
+def _init_worker(policy: dict[str, Any], out_dir: str) -> None:
+    """Share the grading policy with a worker process once.
+
+    Args:
+        policy (dict[str, Any]): The grading policy.
+        out_dir (str): Where processed results are written.
+    """
+    global _policy, _out_dir
+    _policy = policy
+    _out_dir = out_dir
+
+
+def _regrade_chunk(export_dir: str, names: list[str]) -> list[dict[str, Any]]:
+    """Regrade a chunk of submissions.
+
+    Args:
+        export_dir (str): The exported submissions directory.
+        names (list[str]): The submission directory names to regrade.
+
+    Returns:
+        list[dict[str, Any]]: One summary row per submission (with just the
+        error for a submission that couldn't be regraded).
+    """
+    rows = []
+    for name in names:
+        try:
+            processor = SubmissionProcessor(
+                root=os.path.join(export_dir, name),
+                policy=_policy,
+                results_path=os.path.join(_out_dir, f"{name}.json"),
+            )
+            processor.process()
+        except Exception as error:
+            rows.append(
+                {"submission": name, "error": f"{type(error).__name__}: {error}"}
+            )
+            continue
+        rows.append({"submission": name, **processor.summary()})
+    return rows
+
+
+def regrade(
+    export_dir: str,
+    policy: dict[str, Any],
+    out_dir: str,
+    workers: int | None = None,
+) -> list[dict[str, Any]]:
+    """Regrade every submission in a course export.
+
+    Args:
+        export_dir (str): The exported submissions directory.
+        policy (dict[str, Any]): The grading policy.
+        out_dir (str): Where each submission's processed results are written.
+        workers (int | None): Number of worker processes (defaults to all cores).
+
+    Returns:
+        list[dict[str, Any]]: One summary row per submission, in export order.
+    """
+    names = find_submissions(export_dir)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(names) or 1))
+    os.makedirs(out_dir, exist_ok=True)
+
+    # A few chunks per worker keeps them all busy without paying for a task per submission
+    chunk_size = max(1, len(names) // (workers * 4))
+    chunks = [names[i : i + chunk_size] for i in range(0, len(names), chunk_size)]
+
+    rows: list[dict[str, Any]] = []
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(policy, out_dir)
+    ) as pool:
+        for chunk_rows in pool.map(_regrade_chunk, [export_dir] * len(chunks), chunks):
+            rows.extend(chunk_rows)
+
+    return rows
+
+
+def write_summary(rows: list[dict[str, Any]], path: str) -> None:
+    """Write the regrade summary as a CSV file.
+
+    Args:
+        rows (list[dict[str, Any]]): The summary rows.
+        path (str): The CSV file to write.
+    """
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main() -> None:
+    """Run the program."""
+    parser = argparse.ArgumentParser(description="Regrade a course export.")
+    parser.add_argument("export_dir", help="directory of exported submissions")
+    parser.add_argument(
+        "--source", default=".", help="directory containing config.json"
+    )
+    parser.add_argument(
+        "--out", help="results output directory (default: EXPORT_DIR/regraded)"
+    )
+    parser.add_argument(
+        "--summary", help="summary CSV path (default: EXPORT_DIR/summary.csv)"
+    )
+    parser.add_argument("--workers", type=int, help="worker processes (default: all)")
+    args = parser.parse_args()
+
+    # Load the policy (validating config.json if needed) once for the whole export
+    policy = load_policy(args.source)
+    export_dir = os.path.abspath(args.export_dir)
+
+    start = time.perf_counter()
+    rows = regrade(
+        export_dir,
+        policy,
+        os.path.abspath(args.out or os.path.join(export_dir, "regraded")),
+        args.workers,
+    )
+    elapsed = time.perf_counter() - start
+
+    write_summary(rows, args.summary or os.path.join(export_dir, "summary.csv"))
+    rate = len(rows) / elapsed if elapsed > 0 else 0.0
+    print(
+        f"Regraded {len(rows)} submissions in {elapsed:.2f}s ({rate:.1f} submissions/sec)",
+        file=sys.stderr,
+    )
+    failed = [row for row in rows if row.get("error")]
+    for row in failed:
+        print(f"Couldn't regrade {row['submission']}: {row['error']}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+This file benchmarks reading submission_metadata.json for a heavy submitter.
+
+It writes synthetic metadata with 1,000 previous submissions (each with its
+full results, as Gradescope exports them) and times reading it fully with
+json, with the fastest installed codec (see jsoncodec.py), and as only the
+fields the grader uses (see metadata.py), with each reader's peak memory.
+
+Usage:
+    python3 benchmarks/bench_metadata.py [--previous N] [--repeat N]
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jsoncodec  # noqa: E402
+from metadata import SubmissionMetadata  # noqa: E402
+
+
+def synthetic_metadata(previous: int, tests: int = 12) -> dict[str, Any]:
+    """Create submission metadata with `previous` previous submissions.
+
+    Args:
+        previous (int): The number of previous submissions.
+        tests (int): The number of tests in each submission's results.
+
+    Returns:
+        dict[str, Any]: The submission metadata.
+    """
+
+    def results(score: float) -> dict[str, Any]:
+        return {
+            "score": score,
+            "execution_time": "0.42",
+            "tests": [
+                {
+                    "name": f"Test {number}: checks part {number} of the lab",
+                    "number": str(number),
+                    "score": 10.0,
+                    "max_score": 10.0,
+                    "status": "passed",
+                    "output": f"Output of test {number}\n" * 8,
+                    "visibility": "visible",
+                }
+                for number in range(tests)
+            ],
+        }
+
+    return {
+        "id": 123456789,
+        "created_at": "2025-01-21T23:10:00.000000-06:00",
+        "assignment": {
+            "id": 555,
+            "title": "Lab 2",
+            "due_date": "2025-01-20T23:59:00.000000-06:00",
+            "total_points": "100.0",
+        },
+        "users": [{"email": "student@u.northwestern.edu", "id": 1, "name": "A"}],
+        "previous_submissions": [
+            {
+                "submission_time": f"2025-01-{1 + i % 20:02d}T12:00:00.000000-06:00",
+                "score": str(float(i % 100)),
+                "results": results(float(i % 100)),
+            }
+            for i in range(previous)
+        ],
+    }
+
+
+def measure(read: Callable[[], Any], repeat: int) -> tuple[float, float]:
+    """Time a reader (best of `repeat`) and measure its peak memory.
+
+    Args:
+        read (Callable[[], Any]): Reads the metadata.
+        repeat (int): How many times to time it.
+
+    Returns:
+        tuple[float, float]: The best time in milliseconds and the peak memory in MB.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        read()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    read()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best * 1000, peak / (1024 * 1024)
+
+
+def main() -> None:
+    """Run the program."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--previous", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "submission_metadata.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(synthetic_metadata(args.previous), f)
+        size = os.path.getsize(path) / (1024 * 1024)
+        print(f"{args.previous} previous submissions, {size:.1f} MB")
+
+        def read_json() -> Any:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+
+        readers = {
+            "json.load (everything)": read_json,
+            f"jsoncodec ({jsoncodec.NAME}, everything)": lambda: jsoncodec.read(path),
+            f"SubmissionMetadata ({jsoncodec.NAME})": lambda: SubmissionMetadata.read(
+                path
+            ),
+        }
+        if importlib.util.find_spec("ijson") is not None:
+            readers["SubmissionMetadata (ijson stream)"] = (
+                lambda: SubmissionMetadata.read(path, stream=True)
+            )
+
+        print(f"{'reader':<40} {'ms':>8} {'peak MB':>8}")
+        for name, read in readers.items():
+            milliseconds, peak = measure(read, args.repeat)
+            print(f"{name:<40} {milliseconds:>8.2f} {peak:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
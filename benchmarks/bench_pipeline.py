@@ -0,0 +1,254 @@
+"""
+This file benchmarks grading end to end over generated /autograder trees.
+
+For each tree (see generate.py) it times, in order:
+- `SubmissionProcessor` construction and `process()`, in this process (the
+  best of a few runs, since each takes well under a millisecond);
+- `run_tests.py`, in a new interpreter (after staging the student's files);
+- `run_autograder`'s `python3 grade.py`, in a new interpreter.
+
+The trees' generated results.json files are restored afterwards, so the same
+trees can be benchmarked again. Each phase's throughput and latency
+percentiles are reported. Given a baseline saved by an earlier run, it exits
+with status 1 if any phase's p50 or p95 latency got slower, or its throughput
+got lower, by more than the margin.
+
+Usage:
+    python3 benchmarks/bench_pipeline.py TREES_DIR [--phases PHASE,...]
+                                         [--limit N] [--repeat N] [--baseline PATH]
+                                         [--save-baseline PATH] [--margin F]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Callable
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jsoncodec  # noqa: E402
+from grade import stage_files  # noqa: E402
+from metrics import PERCENTILES, percentile  # noqa: E402
+from policy import load_policy  # noqa: E402
+from processor import SubmissionProcessor  # noqa: E402
+
+PHASES = ("construct", "process", "run_tests", "run_autograder")
+# Compared against the baseline (higher is worse, except for throughput)
+COMPARED = ("p50", "p95", "throughput")
+
+
+def find_trees(trees_dir: str) -> list[str]:
+    """Find the generated trees.
+
+    Args:
+        trees_dir (str): The directory the trees were generated in.
+
+    Returns:
+        list[str]: The trees' directories, in order.
+    """
+    return sorted(
+        os.path.join(trees_dir, name)
+        for name in os.listdir(trees_dir)
+        if os.path.exists(os.path.join(trees_dir, name, "submission_metadata.json"))
+    )
+
+
+def time_processor(
+    roots: list[str], policy: dict[str, Any], repeat: int
+) -> dict[str, list[float]]:
+    """Time constructing and running `SubmissionProcessor` for each tree.
+
+    Args:
+        roots (list[str]): The trees.
+        policy (dict[str, Any]): The compiled grading policy.
+        repeat (int): How many times to time each tree (the best time is kept).
+
+    Returns:
+        dict[str, list[float]]: The seconds each step took, per tree.
+    """
+    times: dict[str, list[float]] = {"construct": [], "process": []}
+    for root in roots:
+        # Written next to results.json, which stays the processor's input
+        results_path = os.path.join(root, "results", "processed.json")
+        construct = process = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            processor = SubmissionProcessor(root, policy, results_path=results_path)
+            built = time.perf_counter()
+            processor.process()
+            done = time.perf_counter()
+            construct = min(construct, built - start)
+            process = min(process, done - built)
+        times["construct"].append(construct)
+        times["process"].append(process)
+    return times
+
+
+def time_command(
+    roots: list[str], command: list[str], prepare: Callable[[str], None]
+) -> list[float]:
+    """Time running a command in each tree's source directory, like run_autograder.
+
+    Args:
+        roots (list[str]): The trees.
+        command (list[str]): The command.
+        prepare (Callable[[str], None]): Run (untimed) on each tree first.
+
+    Returns:
+        list[float]: The seconds the command took, per tree.
+    """
+    env = dict(os.environ)
+    env.pop("AUTOGRADER_CACHE_DIR", None)
+    times = []
+    for root in roots:
+        prepare(root)
+        env["AUTOGRADER_ROOT"] = root
+        start = time.perf_counter()
+        subprocess.run(
+            command,
+            cwd=os.path.join(root, "source"),
+            env=env,
+            stdout=subprocess.DEVNULL,
+            check=True,
+        )
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def summarize(seconds: list[float]) -> dict[str, float]:
+    """Summarize a phase's latencies.
+
+    Args:
+        seconds (list[float]): The seconds the phase took, per tree.
+
+    Returns:
+        dict[str, float]: The throughput (per second) and the latency
+        percentiles (in milliseconds).
+    """
+    summary = {"count": len(seconds), "throughput": len(seconds) / sum(seconds)}
+    for percent in PERCENTILES:
+        summary[f"p{percent}"] = percentile(seconds, percent) * 1000
+    return summary
+
+
+def regressions(
+    report: dict[str, dict[str, float]],
+    baseline: dict[str, dict[str, float]],
+    margin: float,
+) -> list[str]:
+    """Compare a run with the baseline.
+
+    Args:
+        report (dict[str, dict[str, float]]): This run's summary, by phase.
+        baseline (dict[str, dict[str, float]]): The baseline's summary, by phase.
+        margin (float): How much worse (as a fraction) is allowed.
+
+    Returns:
+        list[str]: A description of each regression.
+    """
+    found = []
+    for phase, summary in report.items():
+        if phase not in baseline:
+            continue
+        for key in COMPARED:
+            before, after = baseline[phase][key], summary[key]
+            if key == "throughput":
+                worse = after < before / (1 + margin)
+            else:
+                worse = after > before * (1 + margin)
+            if worse:
+                found.append(f"{phase} {key}: {before:.2f} -> {after:.2f}")
+    return found
+
+
+def main() -> None:
+    """Run the program."""
+    parser = argparse.ArgumentParser(description="Benchmark grading end to end.")
+    parser.add_argument("trees_dir", help="directory of trees made by generate.py")
+    parser.add_argument(
+        "--phases",
+        default=",".join(PHASES),
+        help=f"comma-separated phases to time (default: {','.join(PHASES)})",
+    )
+    parser.add_argument(
+        "--limit", type=int, help="trees to run the scripts on (default: all)"
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="times to run the processor per tree, keeping the best (default: 5)",
+    )
+    parser.add_argument("--baseline", help="fail if slower than this saved report")
+    parser.add_argument("--save-baseline", help="save this run's report here")
+    parser.add_argument(
+        "--margin",
+        type=float,
+        default=0.2,
+        help="allowed slowdown against the baseline (default: 0.2, i.e. 20%%)",
+    )
+    args = parser.parse_args()
+    phases = args.phases.split(",")
+
+    # Absolute, since write_json joins relative paths onto the autograder root
+    roots = find_trees(os.path.abspath(args.trees_dir))
+    scripted = roots[: args.limit]
+    source_dir = os.path.join(args.trees_dir, "source")
+    policy = load_policy(source_dir)
+    files_needed = policy["config"]["files_needed"]
+
+    def stage(root: str) -> None:
+        stage_files(
+            files_needed,
+            os.path.join(root, "submission"),
+            os.path.join(source_dir, "files"),
+        )
+
+    # The scripts overwrite results.json, so keep the generated ones to restore
+    generated = {
+        root: jsoncodec.read(os.path.join(root, "results", "results.json"))
+        for root in scripted
+    }
+    times: dict[str, list[float]] = {}
+    try:
+        if "construct" in phases or "process" in phases:
+            times.update(time_processor(roots, policy, args.repeat))
+        if "run_tests" in phases:
+            command = [sys.executable, "run_tests.py"]
+            times["run_tests"] = time_command(scripted, command, stage)
+        if "run_autograder" in phases:
+            command = [sys.executable, "grade.py"]
+            times["run_autograder"] = time_command(scripted, command, lambda _: None)
+    finally:
+        for root, results in generated.items():
+            SubmissionProcessor.write_json(results, root, "results", "results.json")
+
+    report = {
+        phase: summarize(seconds) for phase, seconds in times.items() if phase in phases
+    }
+    print(
+        f"{'phase':<16} {'count':>6} {'per sec':>9}"
+        + "".join(f" {f'p{percent} (ms)':>10}" for percent in PERCENTILES)
+    )
+    for phase, summary in report.items():
+        print(
+            f"{phase:<16} {summary['count']:>6} {summary['throughput']:>9.1f}"
+            + "".join(f" {summary[f'p{percent}']:>10.2f}" for percent in PERCENTILES)
+        )
+
+    if args.save_baseline:
+        SubmissionProcessor.write_json(report, os.path.abspath(args.save_baseline))
+        print(f"Saved the baseline to {args.save_baseline}")
+    if args.baseline:
+        found = regressions(report, jsoncodec.read(args.baseline), args.margin)
+        for regression in found:
+            print(f"Regression (over {args.margin:.0%}): {regression}")
+        if found:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline} (margin {args.margin:.0%})")
+
+
+if __name__ == "__main__":
+    main()
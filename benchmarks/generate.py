@@ -0,0 +1,237 @@
+"""
+This file generates synthetic /autograder trees to load-test the grader with.
+
+Each tree is laid out like /autograder on Gradescope: the student's files in
+`submission/`, a `submission_metadata.json`, a `results/results.json` (as if
+the tests had already run), and `source/`, a symlink to one shared copy of
+the autograder source. Across the trees, the submission times vary around the
+due date, some students have the extensions in config.json, and the number
+of previous submissions and the size of the results vary. The same seed
+always generates the same trees.
+
+A tree can be graded like on Gradescope with
+`cd TREE/source && AUTOGRADER_ROOT=TREE python3 grade.py`. The trees are
+also laid out like a course export, for batch.py.
+
+Usage:
+    python3 benchmarks/generate.py OUT_DIR [--count N] [--seed N]
+                                   [--submission DIR] [--source DIR]
+                                   [--max-previous N] [--max-tests N]
+                                   [--max-output N]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+from datetime import datetime, timedelta
+from typing import Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jsoncodec  # noqa: E402
+from metadata import METADATA_FILE  # noqa: E402
+from policy import write_policy  # noqa: E402
+
+DUE_DATE = datetime.fromisoformat("2025-01-20T23:59:00.000000-06:00")
+TOTAL_POINTS = 100.0
+# Not copied into the shared source
+IGNORED = (".git", "__pycache__", "benchmarks", "requests.jsonl", "policy.json")
+
+
+def copy_source(source_dir: str, out_dir: str) -> str:
+    """Copy the autograder source once, with a compiled policy.json (as setup.sh does).
+
+    Args:
+        source_dir (str): The autograder source directory.
+        out_dir (str): Where the trees are generated.
+
+    Returns:
+        str: The shared source directory.
+    """
+    shared = os.path.join(out_dir, "source")
+    shutil.copytree(source_dir, shared, ignore=shutil.ignore_patterns(*IGNORED))
+    write_policy(shared)
+    return shared
+
+
+def synthetic_results(rng: random.Random, tests: int, output: int) -> dict[str, Any]:
+    """Create a results.json with `tests` tests and up to `output` characters each.
+
+    Args:
+        rng (random.Random): The random number generator.
+        tests (int): The number of tests.
+        output (int): The most output characters per test.
+
+    Returns:
+        dict[str, Any]: The results.
+    """
+    results = []
+    for number in range(tests):
+        passed = rng.random() < 0.8
+        results.append(
+            {
+                "name": f"test_part_{number} (test_simple.TestLab)",
+                "number": str(number),
+                "score": TOTAL_POINTS / tests if passed else 0.0,
+                "max_score": TOTAL_POINTS / tests,
+                "status": "passed" if passed else "failed",
+                "output": "x" * rng.randint(0, output),
+            }
+        )
+    return {
+        "tests": results,
+        "leaderboard": [],
+        "visibility": "visible",
+        "execution_time": f"{rng.uniform(0.1, 5):.2f}",
+        "score": sum(test["score"] for test in results),
+    }
+
+
+def synthetic_metadata(
+    rng: random.Random,
+    index: int,
+    config: dict[str, Any],
+    max_previous: int,
+    results: dict[str, Any],
+) -> dict[str, Any]:
+    """Create a submission_metadata.json around the due date.
+
+    Args:
+        rng (random.Random): The random number generator.
+        index (int): The submission's number.
+        config (dict[str, Any]): The config.json data.
+        max_previous (int): The most previous submissions.
+        results (dict[str, Any]): The results each previous submission had.
+
+    Returns:
+        dict[str, Any]: The submission metadata.
+    """
+    extended = list(config["extensions"])
+    if extended and rng.random() < 0.2:
+        email = rng.choice(extended)
+    else:
+        email = f"student{index}@u.northwestern.edu"
+
+    # From a few days early to a few days past the late deadline
+    created_at = DUE_DATE + timedelta(days=rng.uniform(-5, config["max_late_days"] + 5))
+    # Mostly a few previous submissions, sometimes many
+    previous = min(max_previous, int(rng.expovariate(1 / 4)))
+    if rng.random() < 0.05:
+        previous = max_previous
+    times = sorted(
+        created_at - timedelta(hours=rng.uniform(0.1, 24 * 14)) for _ in range(previous)
+    )
+    return {
+        "id": 100_000 + index,
+        "created_at": created_at.isoformat(),
+        "assignment": {
+            "id": 1,
+            "title": config["lab_name"],
+            "due_date": DUE_DATE.isoformat(),
+            "total_points": str(TOTAL_POINTS),
+        },
+        "users": [{"email": email, "id": index, "name": f"Student {index}"}],
+        "previous_submissions": [
+            {
+                "submission_time": time.isoformat(),
+                "score": str(round(rng.uniform(0, TOTAL_POINTS), 1)),
+                "results": results,
+            }
+            for time in times
+        ],
+    }
+
+
+def generate(
+    out_dir: str,
+    count: int,
+    seed: int = 0,
+    submission_dir: str | None = None,
+    source_dir: str = ".",
+    max_previous: int = 40,
+    max_tests: int = 50,
+    max_output: int = 2_000,
+) -> list[str]:
+    """Generate `count` synthetic /autograder trees under `out_dir`.
+
+    Args:
+        out_dir (str): Where to generate the trees (must not exist yet).
+        count (int): The number of trees.
+        seed (int): The random seed.
+        submission_dir (str | None): The student files to put in every
+            tree's `submission/`, if any.
+        source_dir (str): The autograder source directory.
+        max_previous (int): The most previous submissions a tree has.
+        max_tests (int): The most tests in a tree's results.json.
+        max_output (int): The most output characters per test.
+
+    Returns:
+        list[str]: The trees' directories.
+    """
+    rng = random.Random(seed)
+    os.makedirs(out_dir)
+    shared = copy_source(source_dir, out_dir)
+    config = jsoncodec.read(os.path.join(shared, "config.json"))
+
+    roots = []
+    for index in range(count):
+        root = os.path.join(out_dir, f"s{index:05d}")
+        os.makedirs(os.path.join(root, "results"))
+        os.symlink(os.path.relpath(shared, root), os.path.join(root, "source"))
+        if submission_dir is not None:
+            shutil.copytree(submission_dir, os.path.join(root, "submission"))
+        else:
+            os.mkdir(os.path.join(root, "submission"))
+
+        results = synthetic_results(
+            rng, rng.randint(5, max_tests), rng.randint(0, max_output)
+        )
+        metadata = synthetic_metadata(rng, index, config, max_previous, results)
+        for path, data in (
+            (os.path.join(root, METADATA_FILE), metadata),
+            (os.path.join(root, "results", "results.json"), results),
+        ):
+            with open(path, "wb") as f:
+                f.write(jsoncodec.dumps(data))
+        roots.append(root)
+    return roots
+
+
+def main() -> None:
+    """Run the program."""
+    parser = argparse.ArgumentParser(
+        description="Generate synthetic /autograder trees."
+    )
+    parser.add_argument("out_dir", help="directory to generate the trees in")
+    parser.add_argument("--count", type=int, default=100, help="number of trees")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument(
+        "--submission", help="directory of student files to submit in every tree"
+    )
+    parser.add_argument(
+        "--source",
+        default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        help="autograder source directory (default: this repository)",
+    )
+    parser.add_argument("--max-previous", type=int, default=40)
+    parser.add_argument("--max-tests", type=int, default=50)
+    parser.add_argument("--max-output", type=int, default=2_000)
+    args = parser.parse_args()
+
+    roots = generate(
+        args.out_dir,
+        args.count,
+        args.seed,
+        args.submission,
+        args.source,
+        args.max_previous,
+        args.max_tests,
+        args.max_output,
+    )
+    print(f"Generated {len(roots)} submissions in {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+This file keeps test output bounded, however much a student's code prints.
+
+Output over a limit keeps its head and tail with a marker in between. Test
+output is captured in a `BoundedStringIO`, so memory stays bounded while the
+tests run, and results.json is capped per test and in total before it is written.
+"""
+
+import io
+import re
+from collections import deque
+from typing import Any
+
+# Default limits (in characters), overridden by config.json's `output_limits`
+TEST_OUTPUT_LIMIT = 50_000
+TOTAL_OUTPUT_LIMIT = 1_000_000
+
+MARKER = "\n\n... [{0} characters truncated] ...\n\n"
+MARKER_PATTERN = re.compile(r"\n\n\.\.\. \[(\d+) characters truncated\] \.\.\.\n\n")
+# Room left for the marker, so truncated text stays within its limit
+MARKER_ROOM = 64
+
+
+def output_limits(config: dict[str, Any]) -> tuple[int, int]:
+    """Return the per-test and total output limits from config.json.
+
+    Args:
+        config (dict[str, Any]): The config.json data.
+
+    Returns:
+        tuple[int, int]: The per-test and total limits, in characters.
+    """
+    limits = config.get("output_limits", {})
+    return (
+        limits.get("test_chars", TEST_OUTPUT_LIMIT),
+        limits.get("total_chars", TOTAL_OUTPUT_LIMIT),
+    )
+
+
+def truncate(text: str, limit: int) -> str:
+    """Shorten text to at most `limit` characters, keeping its head and tail.
+
+    Args:
+        text (str): The text.
+        limit (int): The most characters to keep.
+
+    Returns:
+        str: The text, with its middle replaced by a marker if it was too long.
+    """
+    if len(text) <= limit:
+        return text
+    keep = max(0, limit - MARKER_ROOM)
+    head = keep // 2
+    tail = len(text) - (keep - head)
+    omitted = tail - head
+
+    # Keep counting what an earlier truncation (e.g. while capturing) dropped
+    for match in MARKER_PATTERN.finditer(text, head, tail):
+        omitted += int(match.group(1)) - len(match.group(0))
+    return text[:head] + MARKER.format(omitted) + text[tail:]
+
+
+class BoundedStringIO(io.StringIO):
+    """A StringIO that only keeps the head and tail of what is written to it.
+
+    Attributes:
+        limit (int): The most characters kept (including the marker).
+        _head_limit (int): The most characters kept from the start.
+        _tail_limit (int): The most characters kept from the end.
+        _tail (deque[str]): The most recent writes, once the head is full.
+        _tail_size (int): The number of characters in `_tail`.
+        _omitted (int): The number of characters dropped so far.
+    """
+
+    def __init__(self, limit: int) -> None:
+        """Initialize the BoundedStringIO instance.
+
+        Args:
+            limit (int): The most characters kept.
+        """
+        super().__init__()
+        self.limit = limit
+        keep = max(0, limit - MARKER_ROOM)
+        self._head_limit = keep // 2
+        self._tail_limit = keep - self._head_limit
+        self._tail: deque[str] = deque()
+        self._tail_size = 0
+        self._omitted = 0
+
+    def write(self, s: str) -> int:
+        written = len(s)
+        if not self._tail and not self._omitted:
+            room = self._head_limit - self.tell()
+            if written <= room:
+                return super().write(s)
+            super().write(s[:room])
+            s = s[room:]
+
+        self._tail.append(s)
+        self._tail_size += len(s)
+        # Drop the oldest writes that no longer fit in the tail
+        while self._tail_size > self._tail_limit:
+            excess = self._tail_size - self._tail_limit
+            oldest = self._tail[0]
+            if len(oldest) <= excess:
+                self._tail.popleft()
+                dropped = len(oldest)
+            else:
+                self._tail[0] = oldest[excess:]
+                dropped = excess
+            self._tail_size -= dropped
+            self._omitted += dropped
+        return written
+
+    def getvalue(self) -> str:
+        head = super().getvalue()
+        if not self._tail and not self._omitted:
+            return head
+        marker = MARKER.format(self._omitted) if self._omitted else ""
+        return head + marker + "".join(self._tail)
+
+    def truncate(self, size: int | None = None) -> int:
+        # unittest empties its buffers between tests with seek(0) + truncate()
+        self._tail.clear()
+        self._tail_size = 0
+        self._omitted = 0
+        return super().truncate(size)
+
+
+def cap_results(results: dict[str, Any], test_limit: int, total_limit: int) -> None:
+    """Cap the output in results.json, per test and in total.
+
+    Args:
+        results (dict[str, Any]): The results.json data (modified in place).
+        test_limit (int): The most characters of output per test (and overall output).
+        total_limit (int): The most characters of output in all.
+    """
+    outputs = [results] + results.get("tests", [])
+    for entry in outputs:
+        if "output" in entry:
+            entry["output"] = truncate(entry["output"], test_limit)
+
+    # Share what's left fairly if everything together is still too much
+    total = sum(len(entry.get("output", "")) for entry in outputs)
+    if total > total_limit:
+        share = total_limit // len(outputs)
+        for entry in outputs:
+            if "output" in entry:
+                entry["output"] = truncate(entry["output"], share)
@@ -0,0 +1,196 @@
+"""
+This file enforces per-test resource budgets on student code.
+
+Each test runs in its own forked child process with CPU time and memory
+rlimits plus a wall-clock timer. A test that goes over its budget fails with a
+clear message, and the remaining tests still run and score.
+"""
+
+import os
+import pickle
+import resource
+import select
+import signal
+import time
+from typing import Any, Callable
+
+
+class BudgetExceeded(Exception):
+    """Raised inside a test that went over its budget."""
+
+
+class Budget:
+    """A class to hold and enforce a per-test resource budget.
+
+    Attributes:
+        wall_seconds (float | None): The wall-clock time allowed per test.
+        cpu_seconds (float | None): The CPU time allowed per test.
+        memory_mb (int | None): The memory allowed per test, on top of what
+            the grader itself is already using.
+    """
+
+    # How long after the wall-clock budget a stuck test is killed outright
+    grace_seconds = 1.0
+
+    def __init__(
+        self,
+        wall_seconds: float | None = None,
+        cpu_seconds: float | None = None,
+        memory_mb: int | None = None,
+    ) -> None:
+        """Initialize the Budget instance.
+
+        Args:
+            wall_seconds (float | None): The wall-clock time allowed per test.
+            cpu_seconds (float | None): The CPU time allowed per test.
+            memory_mb (int | None): The memory allowed per test.
+        """
+        self.wall_seconds = wall_seconds
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+
+    @classmethod
+    def from_config(cls, config: dict[str, Any]) -> "Budget | None":
+        """Create the budget described by config.json's `test_limits`, if any.
+
+        Args:
+            config (dict[str, Any]): The config.json data.
+
+        Returns:
+            Budget | None: The budget, or None if tests are unlimited.
+        """
+        limits = config.get("test_limits")
+        if not limits:
+            return None
+        return cls(
+            limits.get("wall_seconds"),
+            limits.get("cpu_seconds"),
+            limits.get("memory_mb"),
+        )
+
+    def describe(self) -> str:
+        """Describe the budget, e.g. "2s / 256 MB".
+
+        Returns:
+            str: The budget's limits.
+        """
+        parts = []
+        if self.wall_seconds is not None:
+            parts.append(f"{self.wall_seconds:g}s")
+        if self.cpu_seconds is not None and self.cpu_seconds != self.wall_seconds:
+            parts.append(f"{self.cpu_seconds:g}s CPU")
+        if self.memory_mb is not None:
+            parts.append(f"{self.memory_mb} MB")
+        return " / ".join(parts)
+
+    def message(self) -> str:
+        """Return the message given to a test that went over its budget.
+
+        Returns:
+            str: The message.
+        """
+        return f"Test exceeded its budget of {self.describe()}"
+
+    def enforce(self) -> None:
+        """Apply the budget to the current (child) process."""
+
+        def exceeded(signum: int, frame: Any) -> None:
+            raise BudgetExceeded(self.message())
+
+        if self.cpu_seconds is not None:
+            used = sum(resource.getrusage(resource.RUSAGE_SELF)[:2])
+            soft = int(used + self.cpu_seconds + 0.999)
+            signal.signal(signal.SIGXCPU, exceeded)
+            resource.setrlimit(resource.RLIMIT_CPU, (soft, soft + 1))
+        if self.wall_seconds is not None:
+            signal.signal(signal.SIGALRM, exceeded)
+            signal.setitimer(signal.ITIMER_REAL, self.wall_seconds)
+        if self.memory_mb is not None:
+            limit = _address_space() + self.memory_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    def run(self, func: Callable[[], Any]) -> tuple[bool, Any]:
+        """Run a function in a forked child process under the budget.
+
+        Args:
+            func (Callable[[], Any]): The function to run; its return value must
+                be picklable.
+
+        Returns:
+            tuple[bool, Any]: Whether the child returned a value, and either the
+            value or the reason it didn't.
+        """
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            # Child: run under the budget and send back the result
+            os.close(read_fd)
+            status = 1
+            try:
+                self.enforce()
+                value = func()
+                signal.setitimer(signal.ITIMER_REAL, 0)
+                data = pickle.dumps(value)
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(write_fd, view) :]
+                status = 0
+            finally:
+                os._exit(status)
+
+        os.close(write_fd)
+        try:
+            data, timed_out = self._read(read_fd)
+        finally:
+            os.close(read_fd)
+        if timed_out:
+            os.kill(pid, signal.SIGKILL)
+        _, status = os.waitpid(pid, 0)
+
+        if data and os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0:
+            return True, pickle.loads(data)
+        if timed_out or os.WIFSIGNALED(status):
+            return False, self.message()
+        return False, (
+            "Test ended unexpectedly "
+            f"(exit status {os.waitstatus_to_exitcode(status)})"
+        )
+
+    def _read(self, fd: int) -> tuple[bytes, bool]:
+        """Read everything a child sends, giving up once it is well over budget.
+
+        Args:
+            fd (int): The pipe to read.
+
+        Returns:
+            tuple[bytes, bool]: The data read, and whether the child timed out.
+        """
+        limit = self.wall_seconds if self.wall_seconds is not None else self.cpu_seconds
+        deadline = None
+        if limit is not None:
+            deadline = time.monotonic() + limit + self.grace_seconds
+
+        chunks = []
+        while True:
+            timeout = None if deadline is None else deadline - time.monotonic()
+            if timeout is not None and timeout <= 0:
+                return b"".join(chunks), True
+            ready, _, _ = select.select([fd], [], [], timeout)
+            if ready:
+                chunk = os.read(fd, 1 << 16)
+                if not chunk:
+                    return b"".join(chunks), False
+                chunks.append(chunk)
+
+
+def _address_space() -> int:
+    """Return the current process's virtual memory size in bytes.
+
+    Returns:
+        int: The virtual memory size (0 if unknown).
+    """
+    try:
+        with open("/proc/self/statm", encoding="utf-8") as f:
+            return int(f.read().split()[0]) * resource.getpagesize()
+    except (OSError, ValueError, IndexError):
+        return 0
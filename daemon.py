@@ -0,0 +1,492 @@
+"""
+This file runs a warm grading service for local pre-checks and bulk regrades.
+
+`serve` imports the grader, gradescope-utils and pytz, compiles the policy and
+loads the data files in `files/` once, then listens on a Unix socket. Each
+submission is graded in a freshly forked child, so it starts with everything
+already loaded, and nothing the student's code does can change the server's
+state. The child grades in a temporary workspace that mirrors the source
+directory (with symlinks) plus the student's files, imports the tests and the
+student's code there, and writes the submission's results.json as usual.
+
+Each submission is a directory laid out like /autograder: `submission/` with
+the student's files and `submission_metadata.json` (results are written to
+`results/`). Restart the server after changing config.json, the tests or the data.
+
+Usage:
+    python3 daemon.py serve [--source DIR] [--socket PATH] [--jobs N]
+                            [--workers N] [--timeout SECONDS]
+                            [--similarity-db PATH]
+    python3 daemon.py submit SUBMISSION_DIR [SUBMISSION_DIR ...] [--socket PATH]
+"""
+
+import argparse
+import collections
+import json
+import os
+import selectors
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+from typing import Any
+
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), "autograder.sock")
+
+
+def preload(source_dir: str) -> dict[str, Any]:
+    """Import everything grading needs and load the data files, once.
+
+    Args:
+        source_dir (str): The autograder source directory.
+
+    Returns:
+        dict[str, Any]: The compiled grading policy.
+    """
+    os.chdir(source_dir)
+    if source_dir not in sys.path:
+        sys.path.insert(0, source_dir)
+
+    # Grading imports these lazily, so import them before forking
+    import gradescope_utils.autograder_utils.decorators  # type: ignore  # noqa: F401
+    import gradescope_utils.autograder_utils.files  # type: ignore  # noqa: F401
+    import pytz  # type: ignore  # noqa: F401
+
+    import datasets
+    import grade  # noqa: F401
+    import parallel_runner  # noqa: F401
+    from policy import load_policy
+    from processor import SubmissionProcessor
+
+    # The tests read config.json relative to the processor's root
+    SubmissionProcessor.root = os.path.dirname(source_dir)
+    for name in sorted(os.listdir("files")):
+        if name.endswith(".csv"):
+            datasets.load_csv(os.path.join("files", name))
+        elif name.endswith(".json"):
+            datasets.load_json(os.path.join("files", name))
+    return load_policy(source_dir)
+
+
+def make_workspace(source_dir: str, files_needed: list[str], workspace: str) -> None:
+    """Fill an empty directory with a copy of the source directory to grade in.
+
+    Everything is symlinked, except `files/`, which is a new directory with
+    symlinks to the data files (but not to any student files left in it).
+
+    Args:
+        source_dir (str): The autograder source directory.
+        files_needed (list[str]): The file names students need to submit.
+        workspace (str): The empty directory.
+    """
+    for name in os.listdir(source_dir):
+        if name != "files":
+            os.symlink(os.path.join(source_dir, name), os.path.join(workspace, name))
+
+    files_dir = os.path.join(source_dir, "files")
+    os.mkdir(os.path.join(workspace, "files"))
+    for name in os.listdir(files_dir):
+        if name not in files_needed and name != "__pycache__":
+            os.symlink(
+                os.path.join(files_dir, name), os.path.join(workspace, "files", name)
+            )
+
+
+def run_job(
+    root: str,
+    source_dir: str,
+    policy: dict[str, Any],
+    workers: int,
+    workspace: str,
+    similarity_db: str | None = None,
+) -> dict[str, Any]:
+    """Grade one submission (in a forked child) and write its results.json.
+
+    Args:
+        root (str): The submission's directory.
+        source_dir (str): The autograder source directory.
+        policy (dict[str, Any]): The compiled grading policy.
+        workers (int): The number of worker processes to run the tests in.
+        workspace (str): An empty directory to grade in.
+        similarity_db (str | None): The similarity index to add the submission
+            to, if any (see similarity.py).
+
+    Returns:
+        dict[str, Any]: The results, as written to results.json.
+    """
+    from grade import decided_results, index_similarity, run_tests, stage_files
+    from metrics import METRICS_FILE, Metrics
+    from processor import SubmissionProcessor
+
+    metrics = Metrics()
+    results, visible_only = decided_results(root, policy, metrics)
+    if results is not None:
+        if similarity_db:
+            index_similarity(similarity_db, root, policy, metrics)
+        metrics.write(os.path.join(root, "results", METRICS_FILE))
+        return results
+
+    files_needed = policy["config"]["files_needed"]
+    make_workspace(source_dir, files_needed, workspace)
+    os.chdir(workspace)
+    sys.path[sys.path.index(source_dir)] = workspace
+    metrics.phase(
+        "stage files",
+        stage_files,
+        files_needed,
+        os.path.join(root, "submission"),
+        os.path.join(workspace, "files"),
+    )
+    results = run_tests(
+        policy["config"],
+        os.path.join(workspace, "tests"),
+        workers,
+        metrics,
+        visible_only,
+    )
+    os.makedirs(os.path.join(root, "results"), exist_ok=True)
+    processor = metrics.phase(
+        "load submission", SubmissionProcessor, root, policy, results
+    )
+    metrics.phase("post-process", processor.process)
+    if similarity_db:
+        index_similarity(similarity_db, root, policy, metrics)
+    metrics.write(os.path.join(root, "results", METRICS_FILE))
+    return results
+
+
+class Job:
+    """A class to track one submission being graded.
+
+    Attributes:
+        conn (socket.socket): The client connection waiting for the results.
+        root (str): The submission's directory.
+        pid (int): The child process grading it (0 until it starts).
+        workspace (str): The temporary directory it is graded in.
+        fd (int): The pipe the child writes its response to.
+        response (bytearray): What the child has written so far.
+        started (float): When the child started (monotonic clock).
+    """
+
+    def __init__(self, conn: socket.socket, root: str) -> None:
+        """Initialize the Job instance.
+
+        Args:
+            conn (socket.socket): The client connection waiting for the results.
+            root (str): The submission's directory.
+        """
+        self.conn = conn
+        self.root = root
+        self.pid = 0
+        self.workspace = ""
+        self.fd = -1
+        self.response = bytearray()
+        self.started = 0.0
+
+
+class GradingServer:
+    """A class to serve grading jobs on a Unix socket, each in a forked child.
+
+    Requests and responses are one line of JSON each: the client sends
+    `{"root": DIR}` and receives `{"root": DIR, "results": {...}, "seconds": S}`
+    (or `"error"` instead of `"results"`).
+
+    Attributes:
+        source_dir (str): The autograder source directory.
+        socket_path (str): The Unix socket to listen on.
+        jobs (int): The most submissions graded at once.
+        workers (int): The number of worker processes each job's tests run in.
+        timeout (float): How long a job may take before its child is killed.
+        similarity_db (str | None): The similarity index to add submissions to.
+        policy (dict): The compiled grading policy.
+        _queue (deque[Job]): Jobs waiting for a free slot.
+        _running (dict[int, Job]): Running jobs, by their pipe's file descriptor.
+        _requests (dict[socket.socket, bytearray]): Partially read requests.
+        _selector (selectors.BaseSelector): Waits on the socket, clients and pipes.
+    """
+
+    def __init__(
+        self,
+        source_dir: str,
+        socket_path: str = DEFAULT_SOCKET,
+        jobs: int = 1,
+        workers: int = 1,
+        timeout: float = 600.0,
+        similarity_db: str | None = None,
+    ) -> None:
+        """Initialize the GradingServer instance, preloading the grader.
+
+        Args:
+            source_dir (str): The autograder source directory.
+            socket_path (str): The Unix socket to listen on.
+            jobs (int): The most submissions graded at once.
+            workers (int): The number of worker processes each job's tests run in.
+            timeout (float): How long a job may take before its child is killed.
+            similarity_db (str | None): The similarity index to add submissions
+                to, if any (see similarity.py).
+        """
+        self.source_dir = os.path.abspath(source_dir)
+        self.socket_path = os.path.abspath(socket_path)
+        self.jobs = max(1, jobs)
+        self.workers = workers
+        self.timeout = timeout
+        self.similarity_db = similarity_db and os.path.abspath(similarity_db)
+        self.policy = preload(self.source_dir)
+        self._queue: collections.deque[Job] = collections.deque()
+        self._running: dict[int, Job] = {}
+        self._requests: dict[socket.socket, bytearray] = {}
+        self._selector = selectors.DefaultSelector()
+
+    def serve_forever(self) -> None:
+        """Accept and grade submissions until interrupted."""
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.socket_path)
+        server.listen(128)
+        server.setblocking(False)
+        self._selector.register(server, selectors.EVENT_READ, "accept")
+        # Clean up (below) when stopped with `kill` as well as with Ctrl+C
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        print(f"Grading server listening on {self.socket_path}", flush=True)
+
+        try:
+            while True:
+                for key, _ in self._selector.select(timeout=1.0):
+                    if key.data == "accept":
+                        self._accept(server)
+                    elif key.data == "request":
+                        self._read_request(key.fileobj)  # type: ignore
+                    else:
+                        self._read_response(key.data)
+                self._kill_overdue()
+        finally:
+            for job in self._running.values():
+                os.kill(job.pid, signal.SIGKILL)
+                shutil.rmtree(job.workspace, ignore_errors=True)
+            server.close()
+            os.unlink(self.socket_path)
+
+    def _accept(self, server: socket.socket) -> None:
+        """Accept a client connection.
+
+        Args:
+            server (socket.socket): The listening socket.
+        """
+        conn, _ = server.accept()
+        conn.setblocking(False)
+        self._requests[conn] = bytearray()
+        self._selector.register(conn, selectors.EVENT_READ, "request")
+
+    def _read_request(self, conn: socket.socket) -> None:
+        """Read a client's request and queue its job once the whole line arrived.
+
+        Args:
+            conn (socket.socket): The client connection.
+        """
+        data = conn.recv(65536)
+        request = self._requests[conn]
+        request += data
+        if data and b"\n" not in request:
+            return
+
+        self._selector.unregister(conn)
+        del self._requests[conn]
+        try:
+            root = json.loads(request)["root"]
+        except (ValueError, KeyError, TypeError):
+            self._respond(conn, {"error": "Invalid request"})
+            return
+        self._queue.append(Job(conn, root))
+        self._start_jobs()
+
+    def _start_jobs(self) -> None:
+        """Fork children for queued jobs, up to the concurrency limit."""
+        while self._queue and len(self._running) < self.jobs:
+            job = self._queue.popleft()
+            read_fd, write_fd = os.pipe()
+            # Created here, so it is removed even if the child is killed
+            job.workspace = tempfile.mkdtemp(prefix="autograder-")
+            job.started = time.monotonic()
+            job.pid = os.fork()
+            if job.pid == 0:
+                os.close(read_fd)
+                self._run_child(job, write_fd)
+            os.close(write_fd)
+            job.fd = read_fd
+            self._running[read_fd] = job
+            self._selector.register(read_fd, selectors.EVENT_READ, job)
+
+    def _run_child(self, job: Job, write_fd: int) -> None:
+        """Grade a submission in the forked child, send the response and exit.
+
+        Args:
+            job (Job): The job.
+            write_fd (int): The pipe to write the response to.
+        """
+        status = 0
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            self._selector.close()
+            start = time.monotonic()
+            results = run_job(
+                job.root,
+                self.source_dir,
+                self.policy,
+                self.workers,
+                job.workspace,
+                self.similarity_db,
+            )
+            response = {"results": results, "seconds": time.monotonic() - start}
+        except BaseException as error:  # anything, so the child never returns
+            response = {"error": f"{type(error).__name__}: {error}"}
+            status = 1
+        try:
+            with os.fdopen(write_fd, "wb") as pipe:
+                pipe.write(json.dumps({"root": job.root, **response}).encode())
+        finally:
+            sys.stdout.flush()
+            os._exit(status)
+
+    def _read_response(self, job: Job) -> None:
+        """Read a child's response and send it to the client once the child is done.
+
+        Args:
+            job (Job): The job.
+        """
+        data = os.read(job.fd, 65536)
+        if data:
+            job.response += data
+            return
+        self._finish(job, json.loads(job.response or b'{"error": "No response"}'))
+
+    def _kill_overdue(self) -> None:
+        """Kill the children of jobs that went over the timeout."""
+        now = time.monotonic()
+        for job in list(self._running.values()):
+            if now - job.started > self.timeout:
+                os.kill(job.pid, signal.SIGKILL)
+                self._finish(
+                    job,
+                    {"root": job.root, "error": f"Timed out after {self.timeout:g}s"},
+                )
+
+    def _finish(self, job: Job, response: dict[str, Any]) -> None:
+        """Clean up a finished job, respond to its client and start queued jobs.
+
+        Args:
+            job (Job): The job.
+            response (dict[str, Any]): The response to send.
+        """
+        self._selector.unregister(job.fd)
+        os.close(job.fd)
+        del self._running[job.fd]
+        os.waitpid(job.pid, 0)
+        shutil.rmtree(job.workspace, ignore_errors=True)
+        self._respond(job.conn, response)
+        self._start_jobs()
+
+    @staticmethod
+    def _respond(conn: socket.socket, response: dict[str, Any]) -> None:
+        """Send a response to a client and close the connection.
+
+        Args:
+            conn (socket.socket): The client connection.
+            response (dict[str, Any]): The response.
+        """
+        try:
+            conn.setblocking(True)
+            conn.sendall(json.dumps(response).encode() + b"\n")
+        except OSError:
+            pass  # The client went away
+        finally:
+            conn.close()
+
+
+def submit(roots: list[str], socket_path: str = DEFAULT_SOCKET) -> int:
+    """Send submissions to the grading server and print their scores.
+
+    All of them are sent at once, so the server grades them concurrently.
+
+    Args:
+        roots (list[str]): The submissions' directories.
+        socket_path (str): The server's Unix socket.
+
+    Returns:
+        int: The number of submissions that could not be graded.
+    """
+    conns = []
+    for root in roots:
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        conn.connect(socket_path)
+        conn.sendall(json.dumps({"root": os.path.abspath(root)}).encode() + b"\n")
+        conns.append(conn)
+
+    failed = 0
+    for root, conn in zip(roots, conns):
+        with conn, conn.makefile("rb") as f:
+            response = json.loads(f.readline() or b'{"error": "No response"}')
+        if "error" in response:
+            failed += 1
+            print(f"{root}: {response['error']}", file=sys.stderr)
+        else:
+            score = response["results"].get("score")
+            print(f"{root}: score {score} ({response['seconds']:.3f}s)")
+    return failed
+
+
+def main() -> None:
+    """Run the program."""
+    parser = argparse.ArgumentParser(description="Run or use a warm grading server.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="start the grading server")
+    serve_parser.add_argument(
+        "--source", default="/autograder/source", help="autograder source directory"
+    )
+    serve_parser.add_argument("--socket", default=DEFAULT_SOCKET)
+    serve_parser.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="submissions graded at once",
+    )
+    serve_parser.add_argument(
+        "--workers", type=int, default=1, help="worker processes per submission"
+    )
+    serve_parser.add_argument(
+        "--timeout", type=float, default=600.0, help="seconds allowed per submission"
+    )
+    serve_parser.add_argument(
+        "--similarity-db",
+        default=os.environ.get("AUTOGRADER_SIMILARITY_DB"),
+        metavar="PATH",
+        help="add each submission to this similarity index (see similarity.py)",
+    )
+
+    submit_parser = commands.add_parser("submit", help="grade submissions")
+    submit_parser.add_argument("roots", nargs="+", metavar="SUBMISSION_DIR")
+    submit_parser.add_argument("--socket", default=DEFAULT_SOCKET)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        server = GradingServer(
+            args.source,
+            args.socket,
+            args.jobs,
+            args.workers,
+            args.timeout,
+            args.similarity_db,
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    else:
+        sys.exit(1 if submit(args.roots, args.socket) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+This file loads the lab's data files for the tests, once per run.
+
+Each file is parsed once, then every test shares the same read-only copy so
+one test cannot change the data another test sees. `setup.sh` also prebuilds
+a pickle cache of each file so grading a submission skips parsing entirely.
+
+Usage:
+    python3 datasets.py FILE [FILE ...]
+"""
+
+import copy
+import csv
+import json
+import os
+import pickle
+import sys
+import time
+from typing import Any, Callable
+
+CACHE_DIR = "__datacache__"
+
+# (path, where it was loaded from, seconds taken) for every load
+LOAD_TIMES: list[tuple[str, str, float]] = []
+
+_loaded: dict[str, Any] = {}
+
+
+class FrozenList(list):  # type: ignore
+    """A list that cannot be modified.
+
+    It still compares equal to a regular list with the same items. Copy it
+    (`list(data)`, `data[:]`, `copy.copy`, `copy.deepcopy`) to get a list that
+    can be modified; copies (and pickles) are regular lists.
+    """
+
+    def _read_only(self, *args: Any, **kwargs: Any) -> None:
+        raise TypeError(
+            "This data is shared between tests and is read-only, copy it first"
+        )
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+    append = extend = insert = pop = remove = clear = sort = reverse = _read_only
+
+    def __copy__(self) -> list[Any]:
+        return list(self)
+
+    def __deepcopy__(self, memo: dict[int, Any]) -> list[Any]:
+        copied: list[Any] = []
+        memo[id(self)] = copied
+        copied.extend(copy.deepcopy(item, memo) for item in self)
+        return copied
+
+    def __reduce_ex__(self, protocol: Any) -> tuple[type, tuple[list[Any]]]:
+        # The inner lists reduce to regular lists the same way
+        return list, (list(self),)
+
+
+def freeze(value: Any) -> Any:
+    """Make a read-only copy of parsed data (lists are frozen recursively).
+
+    Args:
+        value (Any): The parsed data.
+
+    Returns:
+        Any: The read-only data.
+    """
+    if not isinstance(value, list):
+        return value
+    return FrozenList(
+        [freeze(item) if isinstance(item, list) else item for item in value]
+    )
+
+
+def parse_csv(path: str) -> list[list[str]]:
+    """Parse a CSV file.
+
+    Args:
+        path (str): The CSV file.
+
+    Returns:
+        list[list[str]]: Each row of the file.
+    """
+    with open(path, encoding="utf-8", newline="") as f:
+        return list(csv.reader(f, delimiter=","))
+
+
+def parse_json(path: str) -> Any:
+    """Parse a JSON file.
+
+    Args:
+        path (str): The JSON file.
+
+    Returns:
+        Any: The parsed JSON content.
+    """
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def cache_path(path: str) -> str:
+    """Return where the prebuilt cache of a data file is stored.
+
+    Args:
+        path (str): The data file.
+
+    Returns:
+        str: The cache file path.
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    return os.path.join(directory, CACHE_DIR, name + ".pickle")
+
+
+def _stamp(path: str) -> tuple[int, int]:
+    """Identify a version of a file by its size and modification time.
+
+    Args:
+        path (str): The data file.
+
+    Returns:
+        tuple[int, int]: The file's size and modification time (ns).
+    """
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _load(path: str, parse: Callable[[str], Any]) -> Any:
+    """Load a data file once, from memory, the prebuilt cache or by parsing it.
+
+    Args:
+        path (str): The data file.
+        parse (Callable[[str], Any]): How to parse the file.
+
+    Returns:
+        Any: The read-only data.
+    """
+    # Symlinks to the same file (like a grading daemon's workspaces) share one copy
+    key = os.path.realpath(path)
+    start = time.perf_counter()
+    if key in _loaded:
+        LOAD_TIMES.append((path, "memory", time.perf_counter() - start))
+        return _loaded[key]
+
+    # Use the prebuilt cache if the file hasn't changed since it was built
+    try:
+        with open(cache_path(path), "rb") as f:
+            stamp, data = pickle.load(f)
+        if stamp != _stamp(path):
+            raise ValueError("stale cache")
+        source = "cache"
+    except (OSError, ValueError, pickle.UnpicklingError, EOFError):
+        data = parse(path)
+        source = "parse"
+
+    _loaded[key] = data = freeze(data)
+    LOAD_TIMES.append((path, source, time.perf_counter() - start))
+    return data
+
+
+def load_csv(path: str) -> FrozenList:
+    """Load a CSV file's rows once per run.
+
+    Args:
+        path (str): The CSV file.
+
+    Returns:
+        FrozenList: Each row of the file (read-only).
+    """
+    return _load(path, parse_csv)  # type: ignore
+
+
+def load_json(path: str) -> Any:
+    """Load a JSON file once per run.
+
+    Args:
+        path (str): The JSON file.
+
+    Returns:
+        Any: The parsed JSON content (lists are read-only).
+    """
+    return _load(path, parse_json)
+
+
+def build_cache(path: str) -> None:
+    """Parse a data file and save its prebuilt cache.
+
+    Args:
+        path (str): The data file (.csv or .json).
+    """
+    parse = parse_csv if path.endswith(".csv") else parse_json
+    data = parse(path)
+
+    # Write then rename so a half-written cache is never loaded
+    target = cache_path(path)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(target + ".tmp", "wb") as f:
+        pickle.dump((_stamp(path), data), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(target + ".tmp", target)
+
+
+def main() -> None:
+    """Run the program."""
+    for path in sys.argv[1:]:
+        parse = parse_csv if path.endswith(".csv") else parse_json
+        start = time.perf_counter()
+        parse(path)
+        parse_time = time.perf_counter() - start
+
+        build_cache(path)
+        _load(path, parse)
+        _load(path, parse)
+        (_, _, cache_time), (_, _, memory_time) = LOAD_TIMES[-2:]
+        print(
+            f"{path}: parse {parse_time * 1000:.2f} ms, "
+            f"cached load {cache_time * 1000:.2f} ms, "
+            f"shared load {memory_time * 1000:.3f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,393 @@
+"""
+This file grades a student's submission in a single Python process.
+
+It stages the submitted files, runs the unit tests (or the I/O cases, see
+iograder.py) and post-processes the results (see processor.py) without
+starting another interpreter or writing results.json to disk in between.
+Imports are deferred until they are needed. Each phase's and test's time and
+peak memory are written to metrics.json next to results.json (see metrics.py).
+
+Usage:
+    python3 grade.py [--workers N] [--cache-dir DIR] [--prometheus PATH]
+                     [--similarity-db PATH] [--startup-report]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import time
+from typing import Any, Callable
+
+from metrics import METRICS_FILE, Metrics
+from policy import load_policy
+from processor import SubmissionProcessor
+from result_cache import ResultCache
+
+
+class StartupReport(Metrics):
+    """A class to report where a grading run's startup time goes.
+
+    Like `python3 -X importtime`, every Python module imported while the
+    report is active is timed (self and cumulative, in microseconds),
+    alongside the metrics of each grading phase.
+
+    Attributes:
+        imports (list[tuple[str, float, float]]): Each imported module's name,
+            self time and cumulative time (in seconds).
+        _stack (list[float]): Time spent in nested imports, per active import.
+        _exec_module (Callable): The original `SourceFileLoader.exec_module`.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the StartupReport instance."""
+        super().__init__()
+        self.imports: list[tuple[str, float, float]] = []
+        self._stack: list[float] = []
+        self._exec_module: Callable[..., Any] | None = None
+
+    def start(self) -> None:
+        """Start timing imports of Python source modules."""
+        from importlib.machinery import SourceFileLoader
+
+        report = self
+        self._exec_module = exec_module = SourceFileLoader.exec_module
+
+        def timed_exec_module(loader: Any, module: Any) -> None:
+            report._stack.append(0.0)
+            start = time.perf_counter()
+            try:
+                exec_module(loader, module)
+            finally:
+                cumulative = time.perf_counter() - start
+                nested = report._stack.pop()
+                if report._stack:
+                    report._stack[-1] += cumulative
+                report.imports.append(
+                    (module.__name__, cumulative - nested, cumulative)
+                )
+
+        SourceFileLoader.exec_module = timed_exec_module  # type: ignore
+
+    def stop(self) -> None:
+        """Stop timing imports."""
+        from importlib.machinery import SourceFileLoader
+
+        if self._exec_module is not None:
+            SourceFileLoader.exec_module = self._exec_module  # type: ignore
+            self._exec_module = None
+
+    def print(self, top: int = 15) -> None:
+        """Print the report to stderr.
+
+        Args:
+            top (int): How many of the slowest imports to list.
+        """
+        print("phase                 seconds  peak RSS (MB)", file=sys.stderr)
+        for phase in self.phases:
+            print(
+                f"{phase['name']:<20} {phase['seconds']:>8.3f} {phase['max_rss_mb']:>14.1f}",
+                file=sys.stderr,
+            )
+
+        print("\nimport time:       self [us] |  cumulative | module", file=sys.stderr)
+        slowest = sorted(self.imports, key=lambda item: item[2], reverse=True)
+        for name, self_time, cumulative in slowest[:top]:
+            print(
+                f"import time: {self_time * 1e6:>12.0f} | {cumulative * 1e6:>11.0f} | {name}",
+                file=sys.stderr,
+            )
+
+
+def stage_files(files_needed: list[str], submission_dir: str, files_dir: str) -> None:
+    """Copy the required files from the submission into `files_dir`.
+
+    Args:
+        files_needed (list[str]): The file names students need to submit.
+        submission_dir (str): The directory with the student's submission.
+        files_dir (str): The directory the tests import student files from.
+    """
+    for file in files_needed:
+        path = os.path.join(submission_dir, file)
+        if os.path.exists(path):
+            shutil.copyfile(path, os.path.join(files_dir, file))
+        else:
+            print(f"Warning: {file} not found in {submission_dir}.")
+
+
+def run_tests(
+    config: dict[str, Any],
+    tests_dir: str = "tests",
+    workers: int = 1,
+    metrics: Metrics | None = None,
+    visible_only: bool = False,
+) -> dict[str, Any]:
+    """Run the unit tests (or config.json's `io_cases`) and collect their results.
+
+    Args:
+        config (dict[str, Any]): The config.json data.
+        tests_dir (str): The directory the tests are discovered in.
+        workers (int): The number of worker processes to run the tests in.
+        metrics (Metrics | None): Where to record phase and test metrics, if anywhere.
+        visible_only (bool): Whether to run only the tests students can see now
+            (not the hidden or after-due-date ones).
+
+    Returns:
+        dict[str, Any]: The results, as they would be written to results.json.
+    """
+    import io
+    import unittest
+
+    from bounded_output import output_limits
+    from budget import Budget
+    from parallel_runner import ParallelJSONTestRunner, flatten
+    from profiling import profiled_tests
+    from student_loader import import_budget, load_student_modules
+
+    metrics = metrics or Metrics()
+    if "io_cases" in config:
+        # Grade the student's program by its output instead (see iograder.py)
+        from iograder import IOGrader
+
+        grader = IOGrader(
+            config, os.path.dirname(os.path.abspath(tests_dir)), visible_only
+        )
+        results = metrics.phase("run io cases", grader.run)
+        metrics.add_tests(grader.durations, {})
+        return results  # type: ignore
+
+    # Import the student's code once (under a budget), so discovering the tests doesn't
+    # re-import (or hang on) it for each test module
+    imports = metrics.phase(
+        "import student code",
+        load_student_modules,
+        config["files_needed"],
+        import_budget(config),
+    )
+    suite = metrics.phase(
+        "discover tests", unittest.defaultTestLoader.discover, tests_dir
+    )
+    if visible_only:
+        suite = unittest.TestSuite(
+            case
+            for case in flatten(suite)
+            # Like JSONTestRunner, tests without a visibility are visible
+            if getattr(
+                getattr(case, case._testMethodName, None), "__visibility__", "visible"
+            )
+            == "visible"
+        )
+    runner = ParallelJSONTestRunner(
+        visibility="visible",
+        stream=io.StringIO(),
+        workers=workers,
+        durations_path=os.path.join(os.path.dirname(tests_dir), "test_durations.json"),
+        budget=Budget.from_config(config),
+        output_limit=output_limits(config)[0],
+        profile=profiled_tests(config),
+        imports=imports,
+    )
+    results = metrics.phase("run tests", runner.run, suite)
+    metrics.add_tests(runner.durations, runner.peak_rss)
+    return results  # type: ignore
+
+
+def decided_results(
+    root: str, policy: dict[str, Any], metrics: Metrics
+) -> tuple[dict[str, Any] | None, bool]:
+    """Write the final results without running the tests, if the score is decided.
+
+    Once the submission limit is exceeded or the submission is past the late
+    deadline, the tests' results can't change the score, so only the submission
+    metadata and the student's constants are checked. Unless config.json's
+    `feedback_when_decided` is set, which still runs the visible tests for
+    feedback. A submission that came too soon for the rate limit is never tested.
+
+    Args:
+        root (str): The submission's root directory.
+        policy (dict[str, Any]): The compiled grading policy.
+        metrics (Metrics): Where to record phase metrics.
+
+    Returns:
+        tuple[dict[str, Any] | None, bool]: The results written, or None if the
+        tests should run, and whether only the visible tests should.
+    """
+    results: dict[str, Any] = {"tests": []}
+    processor = metrics.phase(
+        "check policy", SubmissionProcessor, root, policy, results
+    )
+    if processor.is_throttled():
+        results["output"] = (
+            "The tests weren't run, since this submission came too soon."
+        )
+    elif not processor.is_decided():
+        return None, False
+    elif policy["config"].get("feedback_when_decided"):
+        return None, True
+    else:
+        results["output"] = "The tests weren't run, since they can't change this score."
+    os.makedirs(os.path.join(root, "results"), exist_ok=True)
+    metrics.phase("post-process", processor.process)
+    return results, False
+
+
+def index_similarity(
+    db_path: str, root: str, policy: dict[str, Any], metrics: Metrics
+) -> None:
+    """Add the submission to the similarity index, once its results are written.
+
+    The matches (and any error updating the index) are printed for instructors
+    only, never added to results.json, and never stop the grading.
+
+    Args:
+        db_path (str): The similarity index (see similarity.py).
+        root (str): The autograder root directory.
+        policy (dict[str, Any]): The compiled grading policy.
+        metrics (Metrics): Where to record phase metrics.
+    """
+    from similarity import index_submission
+
+    try:
+        metrics.phase(
+            "index similarity",
+            index_submission,
+            db_path,
+            root,
+            policy["config"]["files_needed"],
+        )
+    except Exception as error:
+        print(
+            f"Similarity: couldn't update {db_path} ({type(error).__name__}: {error})"
+        )
+
+
+def grade(
+    root: str,
+    report: StartupReport | None = None,
+    workers: int = 1,
+    cache: ResultCache | None = None,
+    prometheus_path: str | None = None,
+    similarity_db: str | None = None,
+) -> None:
+    """Grade the submission under `root` and write its results.json and metrics.json.
+
+    Args:
+        root (str): The autograder root directory.
+        report (StartupReport | None): Where to record phase metrics, if anywhere.
+        workers (int): The number of worker processes to run the tests in.
+        cache (ResultCache | None): Where test results are reused from, if anywhere.
+        prometheus_path (str | None): Where to also write the metrics as a
+            Prometheus textfile, if anywhere.
+        similarity_db (str | None): The similarity index to add the submission
+            to, if any (see similarity.py).
+    """
+    source_dir = os.path.join(root, "source")
+    report = report or StartupReport()
+
+    policy = report.phase("load policy", load_policy, source_dir)
+    decided, visible_only = decided_results(root, policy, report)
+    if decided is not None:
+        if similarity_db:
+            index_similarity(similarity_db, root, policy, report)
+        report.write(os.path.join(root, "results", METRICS_FILE), prometheus_path)
+        return
+    report.phase(
+        "stage files",
+        stage_files,
+        policy["config"]["files_needed"],
+        os.path.join(root, "submission"),
+        os.path.join(source_dir, "files"),
+    )
+
+    # Reuse the test results of an identical earlier submission, if any
+    # (not for a feedback-only run, which skips some tests)
+    results = None
+    if visible_only:
+        cache = None
+    if cache is not None:
+        key = report.phase("hash submission", cache.key, source_dir, root)
+        if key is None:
+            print("Result cache skipped (the tests time the student's code)")
+            cache = None
+    if cache is not None:
+        results = cache.get(key)  # type: ignore
+        print(
+            f"Result cache {'miss' if results is None else 'hit'} "
+            f"({cache.hits} hits, {cache.misses} misses)"
+        )
+    if results is None:
+        results = run_tests(
+            policy["config"],
+            os.path.join(source_dir, "tests"),
+            workers,
+            report,
+            visible_only,
+        )
+        if cache is not None:
+            cache.put(key, results)  # type: ignore
+    processor = report.phase(
+        "load submission", SubmissionProcessor, root, policy, results
+    )
+    report.phase("post-process", processor.process)
+    if similarity_db:
+        index_similarity(similarity_db, root, policy, report)
+    report.write(os.path.join(root, "results", METRICS_FILE), prometheus_path)
+
+
+def main() -> None:
+    """Run the program."""
+    parser = argparse.ArgumentParser(description="Grade a submission.")
+    parser.add_argument(
+        "--workers", type=int, default=1, help="worker processes to run tests in"
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=os.environ.get("AUTOGRADER_CACHE_DIR"),
+        help="reuse test results of identical submissions cached here",
+    )
+    parser.add_argument(
+        "--prometheus",
+        default=os.environ.get("AUTOGRADER_PROMETHEUS_FILE"),
+        metavar="PATH",
+        help="also write the run's metrics as a Prometheus textfile",
+    )
+    parser.add_argument(
+        "--similarity-db",
+        default=os.environ.get("AUTOGRADER_SIMILARITY_DB"),
+        metavar="PATH",
+        help="add the submission to this similarity index (see similarity.py)",
+    )
+    parser.add_argument(
+        "--startup-report",
+        action="store_true",
+        help="print where the run's time goes (phases and imports) to stderr",
+    )
+    args = parser.parse_args()
+
+    # The tests import the student's code as files.<name>, relative to source/
+    source_dir = os.path.join(SubmissionProcessor.root, "source")
+    os.chdir(source_dir)
+    if source_dir not in sys.path:
+        sys.path.insert(0, source_dir)
+
+    report = StartupReport()
+    if args.startup_report:
+        report.start()
+    cache = ResultCache(args.cache_dir) if args.cache_dir else None
+    try:
+        grade(
+            SubmissionProcessor.root,
+            report,
+            args.workers,
+            cache,
+            args.prometheus,
+            args.similarity_db,
+        )
+    finally:
+        report.stop()
+        if args.startup_report:
+            report.print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+This file recomputes final scores for a whole course's gradebook at once.
+
+It applies the same submission-cap and late-penalty rules as processor.py,
+vectorized with NumPy over every submission in a gradebook export, and can
+compare the current policy against alternatives ("what if the penalty were 2
+and max_late_days 7?") student by student.
+
+The gradebook is a CSV file with one row per submission and the columns:
+    email             submitter emails (separated by ";" for groups)
+    created_at        submission time (ISO 8601)
+    due_date          due date (ISO 8601)
+    raw_score         score from the tests
+    submission_count  this submission's number (1 for the first)
+    previous_score    score of the previous submission (empty for the first)
+
+Requires NumPy (pip3 install numpy).
+
+Usage:
+    python3 gradebook.py GRADEBOOK.csv [--source DIR] [--set KEY=VALUE ...]
+                         [--out PATH]
+"""
+
+import argparse
+import csv
+import json
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+import numpy as np
+
+from policy import CONSTANT_KEYS, compile_policy, load_policy, resolve_constants
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECONDS_PER_DAY = 24 * 60 * 60 * 1_000_000
+
+
+def _to_microseconds(timestamps: list[str]) -> np.ndarray:
+    """Convert ISO 8601 timestamps to microseconds since the epoch.
+
+    Each distinct timestamp (due dates are usually shared) is only parsed once.
+
+    Args:
+        timestamps (list[str]): The timestamps.
+
+    Returns:
+        np.ndarray: The microseconds (int64).
+    """
+    unique, inverse = np.unique(np.asarray(timestamps), return_inverse=True)
+    parsed = []
+    for timestamp in unique:
+        date = datetime.fromisoformat(str(timestamp))
+        if date.tzinfo is None:
+            date = date.replace(tzinfo=timezone.utc)
+        parsed.append((date - EPOCH) // timedelta(microseconds=1))
+    return np.asarray(parsed, dtype=np.int64)[inverse]
+
+
+def load_gradebook(path: str) -> dict[str, np.ndarray]:
+    """Read a gradebook export into columns.
+
+    Args:
+        path (str): The gradebook CSV file.
+
+    Returns:
+        dict[str, np.ndarray]: The gradebook's columns.
+    """
+    with open(path, encoding="utf-8", newline="") as f:
+        rows = list(csv.DictReader(f))
+
+    return {
+        "email": np.asarray([row["email"] for row in rows]),
+        "submitted": _to_microseconds([row["created_at"] for row in rows]),
+        "due": _to_microseconds([row["due_date"] for row in rows]),
+        "raw_score": np.asarray([float(row["raw_score"]) for row in rows]),
+        "submission_count": np.asarray(
+            [int(row["submission_count"]) for row in rows], dtype=np.int64
+        ),
+        "previous_score": np.asarray(
+            [float(row["previous_score"] or "nan") for row in rows]
+        ),
+    }
+
+
+def _constants(emails: np.ndarray, policy: dict[str, Any]) -> dict[str, np.ndarray]:
+    """Look up each submission's grading constants.
+
+    Args:
+        emails (np.ndarray): Each submission's emails (";"-separated).
+        policy (dict[str, Any]): The grading policy.
+
+    Returns:
+        dict[str, np.ndarray]: Each constant, per submission (an unlimited
+        `max_submissions` is infinity).
+    """
+    unique, inverse = np.unique(emails, return_inverse=True)
+    resolved = [resolve_constants(policy, str(email).split(";")) for email in unique]
+    constants = {
+        key: np.asarray([c[key] for c in resolved], dtype=np.float64)[inverse]
+        for key in CONSTANT_KEYS
+        if key != "max_submissions"
+    }
+    constants["max_submissions"] = np.asarray(
+        [c["max_submissions"] or np.inf for c in resolved], dtype=np.float64
+    )[inverse]
+    return constants
+
+
+def final_scores(
+    gradebook: dict[str, np.ndarray], policy: dict[str, Any]
+) -> np.ndarray:
+    """Compute every submission's final score, like SubmissionProcessor.process.
+
+    Args:
+        gradebook (dict[str, np.ndarray]): The gradebook's columns.
+        policy (dict[str, Any]): The grading policy.
+
+    Returns:
+        np.ndarray: The final scores.
+    """
+    constants = _constants(gradebook["email"], policy)
+    min_marks = 0.0
+
+    # Past the submission limit, the previous submission's score counts instead
+    exceeded = gradebook["submission_count"] > constants["max_submissions"]
+    scores = np.where(exceeded, gradebook["previous_score"], gradebook["raw_score"])
+
+    # Days late (as SubmissionProcessor._calc_days_between computes them),
+    # first from the due date and then from the extended due date
+    late = gradebook["submitted"] - gradebook["due"]
+    days_past_due = np.maximum(0.0, (late / 1e6) / (60 * 60 * 24))
+    extension = constants["no_penalty_days"].astype(np.int64) * MICROSECONDS_PER_DAY
+    days_past_extension = np.maximum(0.0, ((late - extension) / 1e6) / (60 * 60 * 24))
+
+    penalized = ~exceeded & (days_past_due > 0)
+    too_late = days_past_extension > constants["max_late_days"]
+    reduced = np.maximum(
+        min_marks, scores - constants["penalty"] * np.ceil(days_past_extension)
+    )
+    late_scores = np.where(too_late, min_marks, reduced)
+    return np.where(penalized, late_scores, scores)  # type: ignore
+
+
+def latest_by_student(
+    gradebook: dict[str, np.ndarray], scores: np.ndarray
+) -> dict[str, float]:
+    """Find each student's score on their latest (active) submission.
+
+    Args:
+        gradebook (dict[str, np.ndarray]): The gradebook's columns.
+        scores (np.ndarray): Each submission's score.
+
+    Returns:
+        dict[str, float]: Each student's (or group's) score.
+    """
+    order = np.argsort(gradebook["submitted"], kind="stable")[::-1]
+    emails, first = np.unique(gradebook["email"][order], return_index=True)
+    return dict(zip(emails.tolist(), scores[order][first].tolist()))
+
+
+def what_if(
+    gradebook: dict[str, np.ndarray],
+    policy: dict[str, Any],
+    overrides: dict[str, Any],
+) -> list[dict[str, Any]]:
+    """Compare each student's score under the current and an alternative policy.
+
+    Args:
+        gradebook (dict[str, np.ndarray]): The gradebook's columns.
+        policy (dict[str, Any]): The current grading policy.
+        overrides (dict[str, Any]): Top-level config.json constants to change.
+
+    Returns:
+        list[dict[str, Any]]: Each student whose score changes, with both scores.
+    """
+    alternative = compile_policy({**policy["config"], **overrides}, "what-if")
+    current = latest_by_student(gradebook, final_scores(gradebook, policy))
+    changed = latest_by_student(gradebook, final_scores(gradebook, alternative))
+    return [
+        {
+            "email": email,
+            "score": score,
+            "what_if_score": changed[email],
+            "diff": changed[email] - score,
+        }
+        for email, score in current.items()
+        if changed[email] != score
+    ]
+
+
+def main() -> None:
+    """Run the program."""
+    parser = argparse.ArgumentParser(description="Recompute a gradebook's scores.")
+    parser.add_argument("gradebook", help="gradebook CSV export")
+    parser.add_argument(
+        "--source", default=".", help="directory containing config.json"
+    )
+    parser.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="what-if value for a config.json constant (e.g. penalty=2)",
+    )
+    parser.add_argument("--out", help="CSV file to write (default: stdout)")
+    args = parser.parse_args()
+
+    policy = load_policy(args.source)
+    gradebook = load_gradebook(args.gradebook)
+    out = open(args.out, "w", encoding="utf-8", newline="") if args.out else sys.stdout
+
+    if args.set:
+        overrides = {}
+        for setting in args.set:
+            key, _, value = setting.partition("=")
+            overrides[key] = json.loads(value)
+        rows = what_if(gradebook, policy, overrides)
+        writer = csv.DictWriter(out, ["email", "score", "what_if_score", "diff"])
+    else:
+        scores = latest_by_student(gradebook, final_scores(gradebook, policy))
+        rows = [{"email": email, "score": score} for email, score in scores.items()]
+        writer = csv.DictWriter(out, ["email", "score"])
+
+    writer.writeheader()
+    writer.writerows(rows)
+    if out is not sys.stdout:
+        out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,430 @@
+"""
+This file grades a student's program by its output on given inputs.
+
+The cases come from config.json's `io_cases`. The student's program is
+compiled once, then run once per case in a child forked from this (already
+warm) interpreter, with stdin read from the case's input file and stdout
+written to a temporary file, under the per-test budget (see budget.py). The
+output is compared with the expected output as a stream, a block or token
+at a time, so huge outputs are never held in memory. Comparisons are exact,
+whitespace-insensitive, or numeric within a tolerance.
+
+The results have the same shape as the unit tests' (see processor.py), with
+how long each case took in its output. grade.py runs the cases instead of the
+unit tests when config.json has `io_cases`; on its own, this file stages the
+student's files and writes /autograder/results/results.json.
+
+Usage:
+    python3 iograder.py
+"""
+
+import builtins
+import itertools
+import math
+import os
+import resource
+import signal
+import sys
+import tempfile
+import time
+import traceback
+from typing import Any, BinaryIO, Iterator
+
+from bounded_output import TEST_OUTPUT_LIMIT, output_limits, truncate
+from budget import Budget, BudgetExceeded
+
+COMPARE_MODES = ("exact", "whitespace", "numeric")
+DEFAULT_TIMEOUT_SECONDS = 10.0
+DEFAULT_MAX_OUTPUT_MB = 64
+# The most characters of a failing case's stderr shown
+ERROR_OUTPUT_LIMIT = 2_000
+BLOCK_SIZE = 1 << 16
+
+
+def tokens(f: BinaryIO) -> Iterator[tuple[bytes, int]]:
+    """Yield each whitespace-separated token of a file with its line number.
+
+    Args:
+        f (BinaryIO): The file.
+
+    Yields:
+        tuple[bytes, int]: Each token and the line it is on.
+    """
+    for line_number, line in enumerate(f, start=1):
+        for token in line.split():
+            yield token, line_number
+
+
+def compare_exact(expected: BinaryIO, actual: BinaryIO) -> str | None:
+    """Compare two files byte for byte, a block at a time.
+
+    Args:
+        expected (BinaryIO): The expected output.
+        actual (BinaryIO): The program's output.
+
+    Returns:
+        str | None: Where they first differ, or None if they are the same.
+    """
+    line = 1
+    while True:
+        want = expected.read(BLOCK_SIZE)
+        got = actual.read(BLOCK_SIZE)
+        if want != got:
+            same = 0
+            while same < min(len(want), len(got)) and want[same] == got[same]:
+                same += 1
+            line += want.count(b"\n", 0, same)
+            if same == len(got):
+                return f"Your output ended early (on line {line})"
+            if same == len(want):
+                return f"Your output has extra text after line {line}"
+            return f"Your output differs from the expected output on line {line}"
+        if not want:
+            return None
+        line += want.count(b"\n")
+
+
+def compare_tokens(
+    expected: BinaryIO, actual: BinaryIO, tolerance: float | None = None
+) -> str | None:
+    """Compare two files token by token, ignoring whitespace.
+
+    Args:
+        expected (BinaryIO): The expected output.
+        actual (BinaryIO): The program's output.
+        tolerance (float | None): If given, numbers match when they are within
+            this (absolute or relative) tolerance.
+
+    Returns:
+        str | None: Where they first differ, or None if they match.
+    """
+    pairs = itertools.zip_longest(tokens(expected), tokens(actual))
+    for index, (want, got) in enumerate(pairs, start=1):
+        if got is None:
+            return f"Your output ended early (after {index - 1} values)"
+        if want is None:
+            return f"Your output has extra text from line {got[1]}: {_show(got[0])}"
+        if want[0] == got[0] or _close(want[0], got[0], tolerance):
+            continue
+        return (
+            f"Expected {_show(want[0])} but got {_show(got[0])} "
+            f"(value {index}, on line {got[1]} of your output)"
+        )
+    return None
+
+
+def _close(want: bytes, got: bytes, tolerance: float | None) -> bool:
+    """Check whether two tokens are numbers within the tolerance.
+
+    Args:
+        want (bytes): The expected token.
+        got (bytes): The program's token.
+        tolerance (float | None): The tolerance, or None to not compare numbers.
+
+    Returns:
+        bool: Whether they are close enough.
+    """
+    if tolerance is None:
+        return False
+    try:
+        return math.isclose(
+            float(want), float(got), rel_tol=tolerance, abs_tol=tolerance
+        )
+    except ValueError:
+        return False
+
+
+def _show(token: bytes) -> str:
+    """Show a token in a message.
+
+    Args:
+        token (bytes): The token.
+
+    Returns:
+        str: The token, shortened if it is long.
+    """
+    return repr(truncate(token.decode(errors="replace"), 80))
+
+
+def compare(
+    expected_path: str, actual_path: str, mode: str, tolerance: float
+) -> str | None:
+    """Compare a case's expected output with the program's.
+
+    Args:
+        expected_path (str): The expected output file.
+        actual_path (str): The program's output file.
+        mode (str): "exact", "whitespace" or "numeric".
+        tolerance (float): The tolerance for numeric comparisons.
+
+    Returns:
+        str | None: Where they first differ, or None if they match.
+    """
+    with open(expected_path, "rb") as expected, open(actual_path, "rb") as actual:
+        if mode == "exact":
+            return compare_exact(expected, actual)
+        return compare_tokens(
+            expected, actual, tolerance if mode == "numeric" else None
+        )
+
+
+def _run_program(
+    code: Any,
+    program_path: str,
+    input_path: str,
+    output_path: str,
+    error_path: str,
+    max_output_bytes: int,
+) -> dict[str, Any]:
+    """Run the student's program as __main__ (in the budgeted child process).
+
+    Args:
+        code (CodeType): The compiled program.
+        program_path (str): The program's file.
+        input_path (str): The file to read stdin from.
+        output_path (str): The file to write stdout to.
+        error_path (str): The file to write stderr to.
+        max_output_bytes (int): The largest stdout or stderr allowed.
+
+    Returns:
+        dict[str, Any]: The program's exit code, and the budget it went over, if any.
+    """
+    # Writing past the limit fails with an OSError instead of filling the disk
+    signal.signal(signal.SIGXFSZ, signal.SIG_IGN)
+    resource.setrlimit(resource.RLIMIT_FSIZE, (max_output_bytes, max_output_bytes))
+    for fd, path, flags in (
+        (0, input_path, os.O_RDONLY),
+        (1, output_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC),
+        (2, error_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC),
+    ):
+        new_fd = os.open(path, flags, 0o600)
+        os.dup2(new_fd, fd)
+        os.close(new_fd)
+    sys.stdin = open(0, closefd=False)
+    sys.stdout = open(1, "w", closefd=False)
+    sys.stderr = open(2, "w", closefd=False)
+
+    program_dir = os.path.dirname(program_path)
+    os.chdir(program_dir)
+    sys.path.insert(0, program_dir)
+    sys.argv = [program_path]
+    outcome: dict[str, Any] = {"exit_code": 0, "budget": None}
+    try:
+        exec(
+            code,
+            {
+                "__name__": "__main__",
+                "__file__": program_path,
+                "__builtins__": builtins,
+            },
+        )
+    except BudgetExceeded as error:
+        outcome["budget"] = str(error)
+    except SystemExit as exit:
+        if exit.code is None or isinstance(exit.code, int):
+            outcome["exit_code"] = exit.code or 0
+        else:
+            print(exit.code, file=sys.stderr)
+            outcome["exit_code"] = 1
+    except BaseException as error:
+        # Leave this file's frame out of the student's traceback
+        traceback.print_exception(error, error, error.__traceback__.tb_next)
+        outcome["exit_code"] = 1
+    finally:
+        for stream in (sys.stdout, sys.stderr):
+            try:
+                stream.flush()
+            except OSError:
+                pass
+    return outcome
+
+
+class IOGrader:
+    """A class to grade a program by its output on the cases in config.json.
+
+    Attributes:
+        source_dir (str): The autograder source directory.
+        settings (dict): config.json's `io_cases`.
+        program_path (str): The student's program.
+        budget (Budget): The budget each case runs under.
+        output_limit (int): The most characters of output kept per case.
+        max_output_bytes (int): The largest output a case may write.
+        durations (dict[str, float]): Each case's seconds taken, by name.
+        visible_only (bool): Whether to skip the cases that aren't visible.
+    """
+
+    def __init__(
+        self, config: dict[str, Any], source_dir: str = ".", visible_only: bool = False
+    ) -> None:
+        """Initialize the IOGrader instance.
+
+        Args:
+            config (dict[str, Any]): The config.json data.
+            source_dir (str): The autograder source directory.
+            visible_only (bool): Whether to skip the cases that aren't visible.
+        """
+        self.source_dir = os.path.abspath(source_dir)
+        self.visible_only = visible_only
+        self.settings = config["io_cases"]
+        self.program_path = os.path.join(
+            self.source_dir, "files", self.settings["program"]
+        )
+        self.budget = Budget.from_config(config) or Budget()
+        if self.budget.wall_seconds is None:
+            self.budget.wall_seconds = self.settings.get(
+                "timeout_seconds", DEFAULT_TIMEOUT_SECONDS
+            )
+        self.output_limit = output_limits(config)[0]
+        self.max_output_bytes = (
+            self.settings.get("max_output_mb", DEFAULT_MAX_OUTPUT_MB) * 1024 * 1024
+        )
+        self.durations: dict[str, float] = {}
+
+    def run(self) -> dict[str, Any]:
+        """Run every case and collect the results.
+
+        Returns:
+            dict[str, Any]: The results, as they would be written to results.json.
+        """
+        start = time.time()
+        error = None
+        code = None
+        try:
+            with open(self.program_path, "rb") as f:
+                code = compile(f.read(), self.program_path, "exec")
+        except FileNotFoundError:
+            error = f"{self.settings['program']} was not submitted"
+        except SyntaxError as syntax_error:
+            error = f"{self.settings['program']} has a {syntax_error}"
+
+        tests = []
+        with tempfile.TemporaryDirectory(prefix="iograder-") as work_dir:
+            for index, case in enumerate(self.settings["cases"]):
+                if self.visible_only and case.get("visibility", "visible") != "visible":
+                    continue
+                if error is not None:
+                    tests.append(self._result(index, case, error, 0.0))
+                else:
+                    tests.append(self._run_case(index, case, code, work_dir))
+
+        return {
+            "tests": tests,
+            "leaderboard": [],
+            "visibility": "visible",
+            "execution_time": format(time.time() - start, "0.2f"),
+            "score": sum(test["score"] for test in tests),
+        }
+
+    def _run_case(
+        self, index: int, case: dict[str, Any], code: Any, work_dir: str
+    ) -> dict[str, Any]:
+        """Run the program on one case and compare its output.
+
+        Args:
+            index (int): The case's position in the table.
+            case (dict[str, Any]): The case.
+            code (CodeType): The compiled program.
+            work_dir (str): Where to write the program's output.
+
+        Returns:
+            dict[str, Any]: The case's result.
+        """
+        output_path = os.path.join(work_dir, "stdout")
+        error_path = os.path.join(work_dir, "stderr")
+        input_path = (
+            os.path.join(self.source_dir, case["input"])
+            if case.get("input")
+            else os.devnull
+        )
+        start = time.perf_counter()
+        finished, outcome = self.budget.run(
+            lambda: _run_program(
+                code,
+                self.program_path,
+                input_path,
+                output_path,
+                error_path,
+                self.max_output_bytes,
+            )
+        )
+        seconds = time.perf_counter() - start
+
+        if not finished:
+            failure = outcome.replace("Test", "Your program", 1)
+        elif outcome["budget"] is not None:
+            failure = outcome["budget"].replace("Test", "Your program", 1)
+        elif os.path.getsize(output_path) >= self.max_output_bytes:
+            failure = (
+                f"Your program printed more than "
+                f"{self.max_output_bytes // (1024 * 1024)} MB"
+            )
+        elif outcome["exit_code"] != 0:
+            failure = f"Your program exited with status {outcome['exit_code']}"
+        else:
+            mode = case.get("compare", self.settings.get("compare", "exact"))
+            tolerance = case.get("tolerance", self.settings.get("tolerance", 1e-6))
+            failure = compare(
+                os.path.join(self.source_dir, case["output"]),
+                output_path,
+                mode,
+                tolerance,
+            )
+
+        if failure is not None and os.path.exists(error_path):
+            with open(error_path, encoding="utf-8", errors="replace") as f:
+                errors = f.read(ERROR_OUTPUT_LIMIT + 1)
+            if errors:
+                failure += "\n\n" + truncate(errors, ERROR_OUTPUT_LIMIT)
+        return self._result(index, case, failure, seconds)
+
+    def _result(
+        self, index: int, case: dict[str, Any], failure: str | None, seconds: float
+    ) -> dict[str, Any]:
+        """Build a case's result, like a unit test's in results.json.
+
+        Args:
+            index (int): The case's position in the table.
+            case (dict[str, Any]): The case.
+            failure (str | None): Why the case failed, if it did.
+            seconds (float): How long the case took.
+
+        Returns:
+            dict[str, Any]: The case's result.
+        """
+        name = case.get("name", f"Case {index + 1}")
+        weight = float(case.get("weight", 1))
+        self.durations[name] = seconds
+        output = f"Ran in {seconds:.3f}s."
+        if failure is not None:
+            output += f"\nTest Failed: {failure}\n"
+        result = {
+            "name": name,
+            "number": str(case.get("number", index + 1)),
+            "score": 0.0 if failure is not None else weight,
+            "max_score": weight,
+            "status": "failed" if failure is not None else "passed",
+            "output": truncate(output, self.output_limit or TEST_OUTPUT_LIMIT),
+        }
+        if "visibility" in case:
+            result["visibility"] = case["visibility"]
+        return result
+
+
+def main() -> None:
+    """Run the program."""
+    from grade import stage_files
+    from processor import SubmissionProcessor
+
+    source_dir = os.path.join(SubmissionProcessor.root, "source")
+    config = SubmissionProcessor.read_json("source", "config.json")
+    stage_files(
+        config["files_needed"],
+        os.path.join(SubmissionProcessor.root, "submission"),
+        os.path.join(source_dir, "files"),
+    )
+    results = IOGrader(config, source_dir).run()
+    SubmissionProcessor.write_json(results, "results", "results.json")
+
+
+if __name__ == "__main__":
+    main()
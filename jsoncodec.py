@@ -0,0 +1,57 @@
+"""
+This file reads and writes JSON with the fastest parser installed.
+
+orjson is used when it is installed (add it to requirements.txt to opt in),
+otherwise the standard library's json. Both write compact JSON as UTF-8 bytes.
+"""
+
+import json
+from typing import Any
+
+try:
+    import orjson  # type: ignore
+except ImportError:
+    orjson = None
+
+NAME = "orjson" if orjson is not None else "json"
+
+
+def loads(data: bytes | str) -> Any:
+    """Parse a JSON document.
+
+    Args:
+        data (bytes | str): The JSON document.
+
+    Returns:
+        Any: The parsed value.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(value: Any) -> bytes:
+    """Serialize a value as compact JSON.
+
+    Args:
+        value (Any): The value to serialize.
+
+    Returns:
+        bytes: The JSON document, encoded as UTF-8.
+    """
+    if orjson is not None:
+        return orjson.dumps(value)  # type: ignore
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
+def read(path: str) -> Any:
+    """Read and parse a JSON file.
+
+    Args:
+        path (str): The file to read.
+
+    Returns:
+        Any: The parsed value.
+    """
+    with open(path, "rb") as f:
+        return loads(f.read())
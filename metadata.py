@@ -0,0 +1,154 @@
+"""
+This file reads only the fields of submission_metadata.json the grader uses.
+
+For students who submit often, submission_metadata.json holds every previous
+submission with its full results, and can run to megabytes. Only the
+submission and due dates, the total points, the submitters' emails, and the
+count, last score and most recent times of the previous submissions are kept,
+so the rest is freed as soon as the file is read. The file is parsed with
+orjson when it is installed (see jsoncodec.py). It can instead be streamed
+with ijson, which never holds the previous submissions in memory but is slower
+than parsing.
+"""
+
+from collections import deque
+from typing import Any
+
+import jsoncodec
+
+METADATA_FILE = "submission_metadata.json"
+# How many previous submission times are kept (the most a rate limit can count)
+RECENT_LIMIT = 100
+
+
+class SubmissionMetadata:
+    """A class to hold the parts of submission_metadata.json the grader uses.
+
+    Attributes:
+        created_at (str): When the submission was made (ISO 8601).
+        due_date (str): When the assignment is due (ISO 8601).
+        total_points (float): The assignment's total points.
+        emails (list[str]): The submitters' emails.
+        previous_count (int): The number of previous submissions.
+        last_score (float | None): The previous submission's score, if any
+            (None if it wasn't scored).
+        recent_times (list[str]): When the last `RECENT_LIMIT` previous
+            submissions were made (ISO 8601), oldest first. Submissions
+            without a time are left out.
+    """
+
+    def __init__(
+        self,
+        created_at: str,
+        due_date: str,
+        total_points: float,
+        emails: list[str],
+        previous_count: int = 0,
+        last_score: float | None = None,
+        recent_times: list[str] | None = None,
+    ) -> None:
+        """Initialize the SubmissionMetadata instance.
+
+        Args:
+            created_at (str): When the submission was made (ISO 8601).
+            due_date (str): When the assignment is due (ISO 8601).
+            total_points (float): The assignment's total points.
+            emails (list[str]): The submitters' emails.
+            previous_count (int): The number of previous submissions.
+            last_score (float | None): The previous submission's score, if any.
+            recent_times (list[str] | None): When the last `RECENT_LIMIT`
+                previous submissions were made (ISO 8601), oldest first.
+        """
+        self.created_at = created_at
+        self.due_date = due_date
+        self.total_points = total_points
+        self.emails = emails
+        self.previous_count = previous_count
+        self.last_score = last_score
+        self.recent_times = recent_times or []
+
+    @classmethod
+    def from_dict(cls, metadata: dict[str, Any]) -> "SubmissionMetadata":
+        """Pick the fields out of parsed submission metadata.
+
+        Args:
+            metadata (dict[str, Any]): The parsed submission_metadata.json.
+
+        Returns:
+            SubmissionMetadata: The fields the grader uses.
+        """
+        previous = metadata.get("previous_submissions", [])
+        return cls(
+            created_at=metadata["created_at"],
+            due_date=metadata["assignment"]["due_date"],
+            total_points=float(metadata["assignment"]["total_points"]),
+            emails=[user["email"] for user in metadata["users"]],
+            previous_count=len(previous),
+            last_score=_score(previous[-1].get("score")) if previous else None,
+            recent_times=[
+                submission["submission_time"]
+                for submission in previous[-RECENT_LIMIT:]
+                if submission.get("submission_time")
+            ],
+        )
+
+    @classmethod
+    def read(cls, path: str, stream: bool = False) -> "SubmissionMetadata":
+        """Read the fields from a submission_metadata.json file.
+
+        Args:
+            path (str): The file to read.
+            stream (bool): Whether to stream the file with ijson (which must be
+                installed) to keep memory use low.
+
+        Returns:
+            SubmissionMetadata: The fields the grader uses.
+        """
+        if stream:
+            return cls._stream(path)
+        return cls.from_dict(jsoncodec.read(path))
+
+    @classmethod
+    def _stream(cls, path: str) -> "SubmissionMetadata":
+        """Read the fields from a file with ijson, one parser event at a time.
+
+        Args:
+            path (str): The file to read.
+
+        Returns:
+            SubmissionMetadata: The fields the grader uses.
+        """
+        import ijson  # type: ignore
+
+        fields: dict[str, Any] = {"emails": [], "previous_count": 0}
+        recent_times: deque[str] = deque(maxlen=RECENT_LIMIT)
+        with open(path, "rb") as f:
+            for prefix, event, value in ijson.parse(f):
+                if prefix == "created_at":
+                    fields["created_at"] = value
+                elif prefix == "assignment.due_date":
+                    fields["due_date"] = value
+                elif prefix == "assignment.total_points":
+                    fields["total_points"] = float(value)
+                elif prefix == "users.item.email":
+                    fields["emails"].append(value)
+                elif prefix == "previous_submissions.item" and event == "start_map":
+                    fields["previous_count"] += 1
+                    fields["last_score"] = None
+                elif prefix == "previous_submissions.item.score":
+                    fields["last_score"] = _score(value)
+                elif prefix == "previous_submissions.item.submission_time" and value:
+                    recent_times.append(value)
+        return cls(**fields, recent_times=list(recent_times))
+
+
+def _score(value: Any) -> float | None:
+    """Convert a previous submission's score, which is null if it wasn't scored.
+
+    Args:
+        value (Any): The score from the metadata.
+
+    Returns:
+        float | None: The score, or None if there isn't one.
+    """
+    return None if value is None else float(value)
@@ -0,0 +1,311 @@
+"""
+This file records where a grading run's time and memory go.
+
+`Metrics` times each grading phase with a monotonic clock and records the
+process's peak RSS during it, along with each test's time and peak RSS (from
+the test runner). On Linux the peak is reset before each phase; elsewhere it
+is the process's peak so far. The metrics are written as metrics.json next to
+results.json, and optionally as a Prometheus textfile (for node_exporter's
+textfile collector).
+
+Run this file to aggregate many runs' metrics.json files (for example a batch
+of submissions before and after a lab's tests change):
+    python3 metrics.py PATH [PATH ...]
+which reports the p50/p95/p99 time and peak RSS of each phase and test.
+"""
+
+import argparse
+import json
+import os
+import resource
+import sys
+import time
+from typing import Any, Callable
+
+METRICS_FILE = "metrics.json"
+PERCENTILES = (50, 95, 99)
+
+
+def max_rss_mb() -> tuple[float, float]:
+    """Return the peak RSS of this process and of its finished children.
+
+    This process's peak is since the last `reset_peak_rss()` (or since it
+    started, where that isn't supported). Its children's is the largest of
+    any finished child, which can't be reset.
+
+    Returns:
+        tuple[float, float]: This process's and its children's peak RSS, in MB.
+    """
+    # ru_maxrss is in kilobytes on Linux (but bytes on macOS)
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024, children
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, children
+
+
+def reset_peak_rss() -> None:
+    """Reset this process's peak RSS to its current RSS (on Linux only)."""
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="ascii") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+class Metrics:
+    """A class to record the time and peak memory of a grading run.
+
+    Attributes:
+        phases (list[dict[str, Any]]): Each phase's name, seconds taken, the
+            process's peak RSS (in MB) during it and the peak RSS of its
+            children so far.
+        tests (dict[str, dict[str, float]]): Each test's seconds taken and peak
+            RSS (in MB), by test id.
+        _start (float): When the run started (monotonic clock).
+        _started_at (float): When the run started (wall clock).
+        _max_rss (float): The process's peak RSS (in MB) in earlier phases,
+            since resetting the peak for each phase loses it.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the Metrics instance."""
+        self.phases: list[dict[str, Any]] = []
+        self.tests: dict[str, dict[str, float]] = {}
+        self._start = time.monotonic()
+        self._started_at = time.time()
+        self._max_rss = 0.0
+
+    def phase(self, name: str, func: Callable[..., Any], *args: Any) -> Any:
+        """Run one grading phase and record its time and peak memory.
+
+        Args:
+            name (str): The phase's name.
+            func (Callable[..., Any]): The phase to run.
+            *args (Any): Arguments passed to `func`.
+
+        Returns:
+            Any: Whatever `func` returns.
+        """
+        reset_peak_rss()
+        start = time.monotonic()
+        try:
+            return func(*args)
+        finally:
+            seconds = time.monotonic() - start
+            own, children = max_rss_mb()
+            self._max_rss = max(self._max_rss, own)
+            self.phases.append(
+                {
+                    "name": name,
+                    "seconds": seconds,
+                    "max_rss_mb": own,
+                    "children_max_rss_mb": children,
+                }
+            )
+
+    def add_tests(
+        self, durations: dict[str, float], peak_rss: dict[str, float]
+    ) -> None:
+        """Record the tests' times and peak memory, as measured by the test runner.
+
+        Args:
+            durations (dict[str, float]): Each test's seconds taken, by test id.
+            peak_rss (dict[str, float]): Each test's peak RSS in MB, by test id.
+        """
+        for test_id, seconds in durations.items():
+            self.tests[test_id] = {"seconds": seconds}
+            if test_id in peak_rss:
+                self.tests[test_id]["max_rss_mb"] = peak_rss[test_id]
+
+    def to_json(self) -> dict[str, Any]:
+        """Return the metrics, as written to metrics.json.
+
+        Returns:
+            dict[str, Any]: The metrics.
+        """
+        own, children = max_rss_mb()
+        return {
+            "started_at": self._started_at,
+            "seconds": time.monotonic() - self._start,
+            "max_rss_mb": max(self._max_rss, own),
+            "children_max_rss_mb": children,
+            "phases": self.phases,
+            "tests": self.tests,
+        }
+
+    def write(self, path: str, prometheus_path: str | None = None) -> None:
+        """Write metrics.json and, optionally, a Prometheus textfile.
+
+        Args:
+            path (str): Where to write metrics.json.
+            prometheus_path (str | None): Where to write the Prometheus textfile.
+        """
+        data = self.to_json()
+        _write_atomic(path, json.dumps(data, indent=2) + "\n")
+        if prometheus_path:
+            _write_atomic(prometheus_path, to_prometheus(data))
+
+
+def to_prometheus(data: dict[str, Any]) -> str:
+    """Format metrics in the Prometheus text exposition format.
+
+    Args:
+        data (dict[str, Any]): The metrics, as written to metrics.json.
+
+    Returns:
+        str: The Prometheus textfile.
+    """
+    lines = [
+        "# HELP autograder_seconds Seconds taken to grade the submission.",
+        "# TYPE autograder_seconds gauge",
+        f"autograder_seconds {data['seconds']}",
+        "# HELP autograder_max_rss_bytes Peak RSS of the grading process.",
+        "# TYPE autograder_max_rss_bytes gauge",
+        f"autograder_max_rss_bytes {int(data['max_rss_mb'] * 1024 * 1024)}",
+        "# HELP autograder_phase_seconds Seconds taken by each grading phase.",
+        "# TYPE autograder_phase_seconds gauge",
+    ]
+    for phase in data["phases"]:
+        lines.append(
+            f'autograder_phase_seconds{{phase="{_label(phase["name"])}"}} '
+            f"{phase['seconds']}"
+        )
+    lines += [
+        "# HELP autograder_test_seconds Seconds taken by each test.",
+        "# TYPE autograder_test_seconds gauge",
+    ]
+    for test_id, test in data["tests"].items():
+        lines.append(
+            f'autograder_test_seconds{{test="{_label(test_id)}"}} {test["seconds"]}'
+        )
+    return "\n".join(lines) + "\n"
+
+
+def _label(value: str) -> str:
+    """Escape a Prometheus label value.
+
+    Args:
+        value (str): The label value.
+
+    Returns:
+        str: The escaped value.
+    """
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _write_atomic(path: str, text: str) -> None:
+    """Write a file atomically (write then rename), so readers never see half of it.
+
+    Args:
+        path (str): The file to write.
+        text (str): Its content.
+    """
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(temp_path, path)
+
+
+def percentile(values: list[float], percent: float) -> float:
+    """Return a percentile of some values, interpolating between the closest two.
+
+    Args:
+        values (list[float]): The values (at least one).
+        percent (float): The percentile, from 0 to 100.
+
+    Returns:
+        float: The percentile.
+    """
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * percent / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def find_metrics(paths: list[str]) -> list[str]:
+    """Find metrics.json files, searching directories recursively.
+
+    Args:
+        paths (list[str]): Files and directories to search.
+
+    Returns:
+        list[str]: The metrics files.
+    """
+    found = []
+    for path in paths:
+        if os.path.isfile(path):
+            found.append(path)
+            continue
+        for directory, dirs, files in os.walk(path):
+            dirs.sort()
+            if METRICS_FILE in files:
+                found.append(os.path.join(directory, METRICS_FILE))
+    return found
+
+
+def aggregate(runs: list[dict[str, Any]]) -> dict[str, dict[str, list[float]]]:
+    """Collect each phase's and test's time and peak RSS across runs.
+
+    Args:
+        runs (list[dict[str, Any]]): The runs' metrics.
+
+    Returns:
+        dict[str, dict[str, list[float]]]: For each row of the report ("total",
+        "phase: <name>" and "test: <id>"), its seconds and peak RSS values.
+    """
+    rows: dict[str, dict[str, list[float]]] = {}
+
+    def add(name: str, entry: dict[str, Any]) -> None:
+        row = rows.setdefault(name, {"seconds": [], "max_rss_mb": []})
+        row["seconds"].append(entry["seconds"])
+        if "max_rss_mb" in entry:
+            row["max_rss_mb"].append(entry["max_rss_mb"])
+
+    for run in runs:
+        add("total", run)
+        for phase in run["phases"]:
+            add(f"phase: {phase['name']}", phase)
+        for test_id, test in run["tests"].items():
+            add(f"test: {test_id}", test)
+    return rows
+
+
+def main() -> None:
+    """Run the program."""
+    parser = argparse.ArgumentParser(
+        description="Report percentiles of many grading runs' metrics."
+    )
+    parser.add_argument(
+        "paths", nargs="+", help="metrics.json files or directories containing them"
+    )
+    args = parser.parse_args()
+
+    runs = []
+    for path in find_metrics(args.paths):
+        with open(path, encoding="utf-8") as f:
+            runs.append(json.load(f))
+    if not runs:
+        sys.exit("No metrics.json files found.")
+
+    rows = aggregate(runs)
+    width = max(len(name) for name in rows)
+    print(f"{len(runs)} runs")
+    header = " ".join(f"{f'p{p} (s)':>9}" for p in PERCENTILES)
+    print(f"{'':<{width}} {header} {'p95 (MB)':>9}")
+    for name, row in rows.items():
+        seconds = " ".join(
+            f"{percentile(row['seconds'], p):>9.3f}" for p in PERCENTILES
+        )
+        rss = percentile(row["max_rss_mb"], 95) if row["max_rss_mb"] else 0.0
+        print(f"{name:<{width}} {seconds} {rss:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""
+This file computes the lab's expected answers from indexes over the data.
+
+Instead of hard-coding the answers for the one fixed dataset, the tests can
+ask an `Oracle` for them, on the fixed data or on a randomized dataset
+generated for each submission (see `random_dataset`), so students can't
+overfit to the expected values. The oracle indexes the dogs by breed (for
+their names too) and zip code and the breeds by name and temperament in one
+pass over each table. Each answer then costs a lookup (or a scan of the distinct breeds, for
+substring matches) rather than a scan of every dog, and is remembered.
+
+The answers follow the lab's specification:
+- breeds are looked up by name ignoring case;
+- dogs match a breed if it is in their breed (column 4), ignoring case;
+- a breed has a temperament if it is in its temperaments (column 5);
+- zip codes (column 6) are unique and sorted (as strings).
+
+Usage:
+    python3 oracle.py [--seed N] [--dogs N] [--breeds N]
+"""
+
+import argparse
+import hashlib
+import os
+import random
+import string
+import time
+from typing import Any
+
+BREED_NAME, TEMPERAMENT = 0, 5
+DOG_NAME, DOG_BREED, DOG_ZIP = 1, 4, 6
+
+
+class Oracle:
+    """A class to answer the lab's questions about some breed and dog data.
+
+    Attributes:
+        breeds (list[list[str]]): The breed data (with its header row).
+        dogs (list[list[str]]): The dog data.
+        _breed_by_name (dict[str, list[str]]): The first breed row of each
+            lowercased name.
+        _breeds_by_temperament (dict[str, list[int]]): The breed rows' indexes
+            for each distinct temperament string.
+        _dogs_by_breed (dict[str, list[int]]): The dogs' indexes for each
+            distinct (lowercased) breed.
+        _breed_names (set[str]): The distinct breeds of the dogs, as written.
+        _zip_codes (list[str]): The dogs' unique zip codes, sorted.
+        _answers (dict[tuple, Any]): Answers already computed, by question.
+    """
+
+    def __init__(self, breeds: list[list[str]], dogs: list[list[str]]) -> None:
+        """Initialize the Oracle instance, indexing the data.
+
+        Args:
+            breeds (list[list[str]]): The breed data (with its header row).
+            dogs (list[list[str]]): The dog data.
+        """
+        self.breeds = breeds
+        self.dogs = dogs
+        self._breed_by_name: dict[str, list[str]] = {}
+        self._breeds_by_temperament: dict[str, list[int]] = {}
+        for index, breed in enumerate(breeds):
+            self._breed_by_name.setdefault(breed[BREED_NAME].lower(), breed)
+            self._breeds_by_temperament.setdefault(breed[TEMPERAMENT], []).append(index)
+
+        self._dogs_by_breed: dict[str, list[int]] = {}
+        self._breed_names: set[str] = set()
+        zip_codes = set()
+        for index, dog in enumerate(dogs):
+            self._dogs_by_breed.setdefault(dog[DOG_BREED].lower(), []).append(index)
+            self._breed_names.add(dog[DOG_BREED])
+            zip_codes.add(dog[DOG_ZIP])
+        self._zip_codes = sorted(zip_codes)
+        self._answers: dict[tuple, Any] = {}
+
+    def breed_data_by_name(self, name: str) -> list[str] | None:
+        """Return the breed data for a breed name, like `get_breed_data_by_name`.
+
+        Args:
+            name (str): The breed's name (any case).
+
+        Returns:
+            list[str] | None: The breed's row, or None if there is none.
+        """
+        return self._breed_by_name.get(name.lower())
+
+    def breed_data_for_dog(self, dog: list[str]) -> list[str] | None:
+        """Return the breed data for a dog, like `get_breed_data_for_dog`.
+
+        Args:
+            dog (list[str]): The dog's row.
+
+        Returns:
+            list[str] | None: The dog's breed's row, or None if there is none.
+        """
+        return self.breed_data_by_name(dog[DOG_BREED])
+
+    def dogs_by_breed(self, breed: str) -> list[list[str]]:
+        """Return the dogs of a breed, in order, like `get_dogs_by_breed`.
+
+        Args:
+            breed (str): Part of the breed (any case).
+
+        Returns:
+            list[list[str]]: The dogs whose breed contains it.
+        """
+        return [self.dogs[index] for index in self._dog_indexes(breed)]
+
+    def names_by_breed(self, breed: str) -> list[str]:
+        """Return the names of the dogs of a breed, like `get_names_by_breed`.
+
+        Args:
+            breed (str): Part of the breed (any case).
+
+        Returns:
+            list[str]: The names of the dogs whose breed contains it.
+        """
+        return [self.dogs[index][DOG_NAME] for index in self._dog_indexes(breed)]
+
+    def count_by_breed(self, breed: str) -> int:
+        """Return how many dogs are of a breed.
+
+        Args:
+            breed (str): Part of the breed (any case).
+
+        Returns:
+            int: The number of dogs whose breed contains it.
+        """
+        return len(self._dog_indexes(breed))
+
+    def breeds_by_temperament(self, temperament: str) -> list[list[str]]:
+        """Return the breeds with a temperament, in order, like `get_breeds_by_temperament`.
+
+        Args:
+            temperament (str): The temperament (case-sensitive).
+
+        Returns:
+            list[list[str]]: The breeds whose temperaments contain it.
+        """
+        key = ("temperament", temperament)
+        if key not in self._answers:
+            indexes = [
+                index
+                for temperaments, rows in self._breeds_by_temperament.items()
+                if temperament in temperaments
+                for index in rows
+            ]
+            self._answers[key] = [self.breeds[index] for index in sorted(indexes)]
+        return self._answers[key]  # type: ignore
+
+    def zip_codes(self) -> list[str]:
+        """Return the dogs' zip codes, like `list_all_zip_codes`.
+
+        Returns:
+            list[str]: The unique zip codes, sorted.
+        """
+        return self._zip_codes
+
+    def dog_breeds(self) -> set[str]:
+        """Return the dogs' distinct breeds, like `list_breeds` on every dog.
+
+        Returns:
+            set[str]: The breeds, as written.
+        """
+        return self._breed_names
+
+    def _dog_indexes(self, breed: str) -> list[int]:
+        """Return the indexes of the dogs of a breed, in order.
+
+        Only the distinct breeds are scanned for the substring, not every dog.
+
+        Args:
+            breed (str): Part of the breed (any case).
+
+        Returns:
+            list[int]: The indexes of the dogs whose breed contains it.
+        """
+        key = ("breed", breed.lower())
+        if key not in self._answers:
+            matches = [
+                indexes
+                for name, indexes in self._dogs_by_breed.items()
+                if key[1] in name
+            ]
+            if len(matches) == 1:
+                self._answers[key] = matches[0]
+            else:
+                self._answers[key] = sorted(
+                    index for indexes in matches for index in indexes
+                )
+        return self._answers[key]  # type: ignore
+
+
+def submission_seed(root: str | None = None) -> int:
+    """Return a random seed that is the same for every run of a submission.
+
+    It is derived from the submitters and the submission time, so a regrade
+    sees the same data while other submissions see different data.
+
+    Args:
+        root (str | None): The autograder root directory (defaults to
+            `SubmissionProcessor.root`).
+
+    Returns:
+        int: The seed (0 if there is no submission metadata, e.g. locally).
+    """
+    from metadata import METADATA_FILE, SubmissionMetadata
+    from processor import SubmissionProcessor
+
+    path = os.path.join(root or SubmissionProcessor.root, METADATA_FILE)
+    try:
+        metadata = SubmissionMetadata.read(path)
+    except OSError:
+        return 0
+    text = ";".join(sorted(metadata.emails)) + metadata.created_at
+    return int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "big")
+
+
+def random_dataset(
+    breeds: list[list[str]],
+    dogs: list[list[str]],
+    seed: int,
+    dog_count: int = 100_000,
+    extra_breeds: int = 100,
+) -> tuple[list[list[str]], list[list[str]]]:
+    """Generate random breed and dog data shaped like the given data.
+
+    The breed data is the given breeds in a random order (after the header)
+    plus `extra_breeds` made-up ones, with temperaments from the given ones.
+    The dogs have names and other columns drawn from the given dogs, breeds
+    from the breed data (some as "<breed> Mix", some unknown), and random zip
+    codes. Columns are drawn all at once, so millions of dogs take seconds.
+
+    Args:
+        breeds (list[list[str]]): The breed data to imitate (with its header row).
+        dogs (list[list[str]]): The dog data to imitate.
+        seed (int): The random seed.
+        dog_count (int): The number of dogs.
+        extra_breeds (int): The number of made-up breeds.
+
+    Returns:
+        tuple[list[list[str]], list[list[str]]]: The breed and dog data.
+    """
+    rng = random.Random(seed)
+    header, rows = breeds[0], [list(breed) for breed in breeds[1:]]
+    temperaments = sorted(
+        {
+            word.strip()
+            for breed in rows
+            for word in breed[TEMPERAMENT].split(",")
+            if word.strip()
+        }
+    )
+    for _ in range(extra_breeds):
+        breed = list(rng.choice(rows))
+        breed[BREED_NAME] = "".join(rng.choices(string.ascii_uppercase, k=1)) + "".join(
+            rng.choices(string.ascii_lowercase, k=rng.randint(4, 9))
+        )
+        breed[TEMPERAMENT] = ", ".join(rng.sample(temperaments, rng.randint(1, 6)))
+        rows.append(breed)
+    rng.shuffle(rows)
+
+    names = [breed[BREED_NAME] for breed in rows]
+    breed_pool = names + [f"{name} Mix" for name in names[: len(names) // 4]]
+    breed_pool += ["Unknown"] * (len(breed_pool) // 10)
+    zip_pool = [str(rng.randint(1000, 99999)) for _ in range(max(1, dog_count // 20))]
+
+    columns = []
+    for column in range(len(dogs[0])):
+        if column == DOG_BREED:
+            columns.append(rng.choices(breed_pool, k=dog_count))
+        elif column == DOG_ZIP:
+            columns.append(rng.choices(zip_pool, k=dog_count))
+        elif column == 0:
+            columns.append([str(index) for index in range(dog_count)])
+        else:
+            # Sorted, since a set's order changes from run to run
+            pool = sorted({dog[column] for dog in dogs})
+            columns.append(rng.choices(pool, k=dog_count))
+    return [header] + rows, [list(dog) for dog in zip(*columns)]
+
+
+def main() -> None:
+    """Run the program."""
+    import datasets
+
+    parser = argparse.ArgumentParser(
+        description="Time generating and indexing a random dataset."
+    )
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--dogs", type=int, default=1_000_000, help="number of dogs")
+    parser.add_argument("--breeds", type=int, default=100, help="made-up breeds")
+    args = parser.parse_args()
+
+    breeds = datasets.load_csv("files/dog_breed_characteristics.csv")
+    dogs = datasets.load_json("files/nyc_dogs.json")
+    start = time.perf_counter()
+    breeds, dogs = random_dataset(breeds, dogs, args.seed, args.dogs, args.breeds)
+    generated = time.perf_counter()
+    oracle = Oracle(breeds, dogs)
+    indexed = time.perf_counter()
+    for breed in breeds[1:]:
+        oracle.count_by_breed(breed[BREED_NAME])
+    answered = time.perf_counter()
+    print(
+        f"{len(dogs):,} dogs and {len(breeds) - 1} breeds: generated in "
+        f"{generated - start:.2f}s, indexed in {indexed - generated:.2f}s, "
+        f"{len(breeds) - 1} breed queries in {answered - indexed:.3f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,507 @@
+"""
+This file runs the unit tests across worker processes.
+
+`ParallelJSONTestRunner` is a drop-in replacement for gradescope-utils'
+`JSONTestRunner`: each worker runs its share of the test cases through a
+`JSONTestRunner`, so weights, numbers and visibility are handled exactly as
+before, then the results are merged into one results.json ordered by test number.
+Tests are scheduled longest-first using the durations recorded by earlier runs.
+With a per-test budget (see budget.py), each test also runs in its own child process,
+forked after its class is set up, so data loaded in `setUpClass` is loaded once.
+Each test's captured output is bounded (see bounded_output.py), and its time
+and peak RSS are recorded (see metrics.py). Tests that opt in are profiled
+(see profiling.py). If some of the student's code could not be imported (see
+student_loader.py), the tests that import it fail at once without running.
+"""
+
+import heapq
+import io
+import itertools
+import json
+import os
+import sys
+import time
+import unittest
+from typing import Any, Callable, TextIO
+
+from gradescope_utils.autograder_utils.json_test_runner import (
+    JSONTestResult,
+    JSONTestRunner,
+)
+
+from bounded_output import TEST_OUTPUT_LIMIT, BoundedStringIO
+from budget import Budget, BudgetExceeded
+from metrics import max_rss_mb
+from profiling import instrument
+from student_loader import (
+    StudentImport,
+    StudentImportError,
+    failure_message,
+    imported_by,
+)
+
+# Set before the worker processes are forked, so they inherit them
+_cases: list[unittest.TestCase] = []
+_runner: "ParallelJSONTestRunner | None" = None
+
+# What running some tests produces: their results, leaderboard entries,
+# durations and peak RSS (both by test id)
+Outcome = tuple[
+    list[dict[str, Any]], list[dict[str, Any]], dict[str, float], dict[str, float]
+]
+
+
+class TimedJSONTestResult(JSONTestResult):  # type: ignore
+    """A JSONTestResult that also records each test's time and peak RSS.
+
+    Attributes:
+        budget (Budget | None): The budget the tests run under, if any.
+        output_limit (int): The most characters of output kept per test.
+        durations (dict[str, float]): Each test's id and seconds taken.
+        peak_rss (dict[str, float]): Each test's id and the process's peak RSS
+            (in MB) after it.
+        _started (float): When the current test started.
+    """
+
+    budget: Budget | None = None
+    output_limit = TEST_OUTPUT_LIMIT
+
+    def __init__(self, *args: Any) -> None:
+        """Initialize the TimedJSONTestResult instance."""
+        super().__init__(*args)
+        self.durations: dict[str, float] = {}
+        self.peak_rss: dict[str, float] = {}
+        self._started = 0.0
+
+    def _setupStdout(self) -> None:
+        # Like TestResult's, but only the head and tail of the output are kept
+        if self.buffer and self._stderr_buffer is None:
+            self._stderr_buffer = BoundedStringIO(self.output_limit)
+            self._stdout_buffer = BoundedStringIO(self.output_limit)
+        super()._setupStdout()
+
+    def startTest(self, test: unittest.TestCase) -> None:
+        self._started = time.perf_counter()
+        super().startTest(test)
+
+    def stopTest(self, test: unittest.TestCase) -> None:
+        super().stopTest(test)
+        self.durations[test.id()] = time.perf_counter() - self._started
+        self.peak_rss[test.id()] = max_rss_mb()[0]
+
+    def addError(self, test: unittest.TestCase, err: Any) -> None:
+        # Running out of the memory budget should read like any other budget overrun
+        if self.budget is not None and issubclass(err[0], MemoryError):
+            err = (BudgetExceeded, BudgetExceeded(self.budget.message()), err[2])
+        super().addError(test, err)
+
+
+def flatten(suite: unittest.TestSuite | unittest.TestCase) -> list[Any]:
+    """Flatten a (nested) test suite into its test cases, in order.
+
+    Args:
+        suite (unittest.TestSuite | unittest.TestCase): The suite to flatten.
+
+    Returns:
+        list[Any]: The test cases.
+    """
+    if isinstance(suite, unittest.TestSuite):
+        return [case for test in suite for case in flatten(test)]
+    return [suite]
+
+
+def schedule(
+    cases: list[Any], durations: dict[str, float], workers: int
+) -> list[list[int]]:
+    """Split test cases between workers, longest first.
+
+    Each test (by its recorded duration) goes to the least busy worker so far.
+    Tests without a recorded duration are assumed to take the average.
+
+    Args:
+        cases (list[Any]): The test cases.
+        durations (dict[str, float]): Recorded durations by test id.
+        workers (int): The number of workers.
+
+    Returns:
+        list[list[int]]: For each worker, the indices of its cases in `cases`.
+    """
+    known = [durations[case.id()] for case in cases if case.id() in durations]
+    default = sum(known) / len(known) if known else 1.0
+    costs = [durations.get(case.id(), default) for case in cases]
+
+    buckets: list[list[int]] = [[] for _ in range(workers)]
+    loads = [(0.0, worker) for worker in range(workers)]
+    for index in sorted(range(len(cases)), key=lambda i: costs[i], reverse=True):
+        load, worker = heapq.heappop(loads)
+        buckets[worker].append(index)
+        heapq.heappush(loads, (load + costs[index], worker))
+
+    # Keep each worker's tests in discovery order, so class fixtures run once
+    return [sorted(bucket) for bucket in buckets if bucket]
+
+
+def _run_cases(
+    indices: list[int],
+) -> Outcome:
+    """Run some of the test cases through a JSONTestRunner.
+
+    Args:
+        indices (list[int]): The indices of the cases to run.
+
+    Returns:
+        Outcome: The tests' results, leaderboard entries, durations and peak RSS.
+    """
+    assert _runner is not None
+    runner = JSONTestRunner(
+        stream=io.StringIO(),
+        visibility=_runner.visibility,
+        failure_prefix=_runner.failure_prefix,
+    )
+    runner.resultclass = _runner.resultclass
+    result = runner.run(unittest.TestSuite(_cases[i] for i in indices))
+    return (
+        runner.json_data["tests"],
+        runner.json_data["leaderboard"],
+        result.durations,
+        result.peak_rss,
+    )
+
+
+def _set_up_class(cls: type) -> bool:
+    """Set up a test class once, before its tests are forked.
+
+    Args:
+        cls (type): The test class.
+
+    Returns:
+        bool: Whether it was set up (if not, each test's child tries again,
+        and reports the error like unittest does).
+    """
+    if getattr(cls, "__unittest_skip__", False):
+        return False
+    try:
+        cls.setUpClass()  # type: ignore
+    except Exception:
+        cls.doClassCleanups()  # type: ignore
+        return False
+    return True
+
+
+def _tear_down_class(cls: type) -> None:
+    """Tear down a test class set up by `_set_up_class`, ignoring errors.
+
+    Args:
+        cls (type): The test class.
+    """
+    try:
+        cls.tearDownClass()  # type: ignore
+    except Exception:
+        pass
+    finally:
+        cls.doClassCleanups()  # type: ignore
+
+
+def _skip_class_fixtures(cls: type) -> None:
+    """Keep the forked child from setting up or tearing down the class again.
+
+    Args:
+        cls (type): The test class (the child's copy).
+    """
+    cls.setUpClass = cls.tearDownClass = classmethod(lambda cls: None)  # type: ignore
+
+
+def _run_budgeted(index: int, budget: Budget, set_up: bool = False) -> Outcome:
+    """Run one test case in a child process under a budget.
+
+    Args:
+        index (int): The index of the case to run.
+        budget (Budget): The test's budget.
+        set_up (bool): Whether the case's class is already set up.
+
+    Returns:
+        Outcome: The test's results, leaderboard entries, durations and peak RSS.
+    """
+
+    def run() -> Outcome:
+        if set_up:
+            _skip_class_fixtures(type(_cases[index]))
+        return _run_cases([index])
+
+    start = time.perf_counter()
+    finished, outcome = budget.run(run)
+    if finished:
+        return outcome  # type: ignore
+
+    # The child never reported back, so fail the test on its behalf
+    assert _runner is not None
+    case = _cases[index]
+    tests: list[dict[str, Any]] = []
+    result = JSONTestResult(None, True, 1, tests, [], _runner.failure_prefix)
+    result.addFailure(case, (BudgetExceeded, BudgetExceeded(outcome), None))
+    return tests, [], {case.id(): time.perf_counter() - start}, {}
+
+
+def _run_bucket(
+    indices: list[int],
+) -> Outcome:
+    """Run one worker's share of the test cases.
+
+    Args:
+        indices (list[int]): The indices of the cases to run.
+
+    Returns:
+        Outcome: The tests' results, leaderboard entries, durations and peak RSS.
+    """
+    assert _runner is not None
+    budget = _runner.budget
+    if budget is None:
+        return _run_cases(indices)
+
+    tests: list[dict[str, Any]] = []
+    leaderboard: list[dict[str, Any]] = []
+    durations: dict[str, float] = {}
+    peak_rss: dict[str, float] = {}
+    # Each class's tests are together (in discovery order), so it is set up once
+    for cls, group in itertools.groupby(indices, key=lambda i: type(_cases[i])):
+        set_up = _set_up_class(cls)
+        try:
+            for index in group:
+                case_tests, case_leaderboard, case_durations, case_rss = _run_budgeted(
+                    index, budget, set_up
+                )
+                tests.extend(case_tests)
+                leaderboard.extend(case_leaderboard)
+                durations.update(case_durations)
+                peak_rss.update(case_rss)
+        finally:
+            if set_up:
+                _tear_down_class(cls)
+    return tests, leaderboard, durations, peak_rss
+
+
+def import_failures(cases: list[Any], imports: list[StudentImport]) -> dict[int, str]:
+    """Find the test cases that import student code that couldn't be imported.
+
+    Args:
+        cases (list[Any]): The test cases.
+        imports (list[StudentImport]): How each student module's import went.
+
+    Returns:
+        dict[int, str]: Why each such case fails, by its index in `cases`.
+    """
+    failed = [record for record in imports if record.error is not None]
+    if not failed:
+        return {}
+    messages: dict[str, str | None] = {}
+    failures = {}
+    for index, case in enumerate(cases):
+        module = type(case).__module__
+        if module not in messages:
+            names = imported_by(module)
+            # If its imports can't be read, assume it uses every student module
+            messages[module] = failure_message(
+                [record for record in failed if names is None or record.module in names]
+            )
+        if messages[module] is not None:
+            failures[index] = messages[module]  # type: ignore
+    return failures
+
+
+def _fail_cases(failures: dict[int, str]) -> Outcome:
+    """Fail some test cases with the given messages, without running them.
+
+    Args:
+        failures (dict[int, str]): Why each case failed, by its index.
+
+    Returns:
+        Outcome: The tests' results, leaderboard entries, durations and peak RSS.
+    """
+    assert _runner is not None
+    tests: list[dict[str, Any]] = []
+    result = JSONTestResult(None, True, 1, tests, [], _runner.failure_prefix)
+    for index, message in failures.items():
+        result.addFailure(
+            _cases[index], (StudentImportError, StudentImportError(message), None)
+        )
+    return tests, [], {}, {}
+
+
+def _number_key(test: dict[str, Any]) -> tuple[Any, ...]:
+    """Sort key ordering test results by number ("1.10" after "1.2"), then name.
+
+    Args:
+        test (dict[str, Any]): A test's result.
+
+    Returns:
+        tuple[Any, ...]: The sort key.
+    """
+    number = test.get("number")
+    if number is None:
+        return (1, (), test["name"])
+    parts = tuple(
+        (0, int(part), "") if part.isdigit() else (1, 0, part)
+        for part in str(number).split(".")
+    )
+    return (0, parts, test["name"])
+
+
+class ParallelJSONTestRunner:
+    """A test runner that runs tests in parallel and displays results in JSON form.
+
+    Attributes:
+        stream (TextIO): Where results.json is written.
+        workers (int): The number of worker processes (1 runs the tests in-process).
+        durations_path (str | None): Where test durations are recorded between runs.
+        budget (Budget | None): The per-test budget, if any.
+        profile (dict[str, int]): Tests to profile (by number), in addition to
+            those with the `profile` decorator.
+        imports (list[StudentImport]): How each student module's import went
+            (tests importing one that failed fail without running).
+        post_processor (Callable | None): Called with the final JSON data before
+            it is written, like JSONTestRunner's.
+        failure_prefix (str): Prepended to each failed test's output.
+        resultclass (type): The result class each worker's JSONTestRunner uses.
+        json_data (dict): The results.
+        durations (dict[str, float]): Each test's seconds taken in the last run.
+        peak_rss (dict[str, float]): Each test's peak RSS (in MB) in the last run.
+    """
+
+    def __init__(
+        self,
+        stream: TextIO = sys.stdout,
+        workers: int = 1,
+        visibility: str | None = None,
+        stdout_visibility: str | None = None,
+        post_processor: Callable[[dict[str, Any]], Any] | None = None,
+        failure_prefix: str = "Test Failed: ",
+        durations_path: str | None = None,
+        budget: Budget | None = None,
+        output_limit: int = TEST_OUTPUT_LIMIT,
+        profile: dict[str, int] | None = None,
+        imports: list[StudentImport] | None = None,
+    ) -> None:
+        """Initialize the ParallelJSONTestRunner instance.
+
+        Args:
+            stream (TextIO): Where results.json is written.
+            workers (int): The number of worker processes (1 runs the tests in-process).
+            visibility (str | None): The default visibility of the tests.
+            stdout_visibility (str | None): The visibility of the test output.
+            post_processor (Callable | None): Called with the final JSON data.
+            failure_prefix (str): Prepended to each failed test's output.
+            durations_path (str | None): Where test durations are recorded between runs.
+            budget (Budget | None): The per-test budget, if any.
+            output_limit (int): The most characters of output kept per test.
+            profile (dict[str, int] | None): Tests to profile (by number), and how
+                many functions to list for each.
+            imports (list[StudentImport] | None): How each student module's
+                import went, if they were imported beforehand.
+        """
+        self.stream = stream
+        self.workers = max(1, workers)
+        self.visibility = visibility
+        self.durations_path = durations_path
+        self.budget = budget
+        self.profile = profile or {}
+        self.imports = imports or []
+        self.post_processor = post_processor
+        self.failure_prefix = failure_prefix
+        self.resultclass = type(
+            "TimedJSONTestResult",
+            (TimedJSONTestResult,),
+            {"budget": budget, "output_limit": output_limit},
+        )
+        self.json_data: dict[str, Any] = {"tests": [], "leaderboard": []}
+        if visibility:
+            self.json_data["visibility"] = visibility
+        if stdout_visibility:
+            self.json_data["stdout_visibility"] = stdout_visibility
+        self.durations: dict[str, float] = {}
+        self.peak_rss: dict[str, float] = {}
+
+    def run(self, test: unittest.TestSuite) -> dict[str, Any]:
+        """Run the given test suite and write the merged results.
+
+        Args:
+            test (unittest.TestSuite): The tests to run.
+
+        Returns:
+            dict[str, Any]: The results, as written to `stream`.
+        """
+        global _cases, _runner
+        _cases = flatten(test)
+        _runner = self
+        instrument(_cases, self.profile)
+        durations = self._read_durations()
+        failures = import_failures(_cases, self.imports)
+        runnable = [index for index in range(len(_cases)) if index not in failures]
+        buckets = [
+            [runnable[i] for i in bucket]
+            for bucket in schedule(
+                [_cases[index] for index in runnable],
+                durations,
+                min(self.workers, len(runnable) or 1),
+            )
+        ]
+
+        start_time = time.time()
+        outcomes = [_fail_cases(failures)]
+        if len(buckets) <= 1:
+            outcomes += [_run_bucket(bucket) for bucket in buckets]
+        else:
+            import multiprocessing
+
+            # Forked workers inherit the discovered (already imported) test cases
+            with multiprocessing.get_context("fork").Pool(len(buckets)) as pool:
+                outcomes += pool.map(_run_bucket, buckets)
+        time_taken = time.time() - start_time
+
+        for tests, leaderboard, bucket_durations, bucket_rss in outcomes:
+            self.json_data["tests"].extend(tests)
+            self.json_data["leaderboard"].extend(leaderboard)
+            self.durations.update(bucket_durations)
+            self.peak_rss.update(bucket_rss)
+        self.json_data["tests"].sort(key=_number_key)
+        self._write_durations({**durations, **self.durations})
+
+        self.json_data["execution_time"] = format(time_taken, "0.2f")
+        self.json_data["score"] = sum(
+            test.get("score", 0.0) for test in self.json_data["tests"]
+        )
+
+        if self.post_processor is not None:
+            self.post_processor(self.json_data)
+
+        json.dump(self.json_data, self.stream, indent=4)
+        self.stream.write("\n")
+        return self.json_data
+
+    def _read_durations(self) -> dict[str, float]:
+        """Read the test durations recorded by earlier runs.
+
+        Returns:
+            dict[str, float]: Each test's id and seconds taken.
+        """
+        if not self.durations_path:
+            return {}
+        try:
+            with open(self.durations_path, encoding="utf-8") as f:
+                return json.load(f)  # type: ignore
+        except (OSError, ValueError):
+            return {}
+
+    def _write_durations(self, durations: dict[str, float]) -> None:
+        """Record the test durations for later runs.
+
+        Args:
+            durations (dict[str, float]): Each test's id and seconds taken.
+        """
+        if not self.durations_path:
+            return
+        try:
+            with open(self.durations_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(durations, f, indent=2, sort_keys=True)
+            os.replace(self.durations_path + ".tmp", self.durations_path)
+        except OSError:
+            pass
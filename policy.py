@@ -0,0 +1,167 @@
+"""
+This file compiles config.json into a grading policy.
+
+The policy is validated once (at setup time) and saved as policy.json next to
+config.json. It holds the default constants and every extension's effective
+constants, keyed by the content hash of config.json so that any edit to the
+config invalidates it automatically.
+
+Usage:
+    python3 policy.py [SOURCE_DIR]
+"""
+
+import hashlib
+import json
+import os
+import sys
+from typing import Any
+
+POLICY_VERSION = 2
+POLICY_FILE = "policy.json"
+CONSTANT_KEYS = ("max_submissions", "max_late_days", "no_penalty_days", "penalty")
+# Optional in config.json; None means no rate limit
+OPTIONAL_KEYS = ("rate_limit",)
+
+
+def hash_config(data: bytes) -> str:
+    """Hash the raw contents of config.json.
+
+    Args:
+        data (bytes): The contents of config.json.
+
+    Returns:
+        str: The hex digest identifying this config.
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def validate_config(config: dict[str, Any], source_dir: str) -> None:
+    """Validate the configuration against config.schema.json.
+
+    Args:
+        config (dict[str, Any]): The config.json data.
+        source_dir (str): The directory containing config.schema.json.
+
+    Raises:
+        ValidationError: If the configuration does not match the schema.
+    """
+    # Only needed when there is no up-to-date policy, so keep it off the hot path
+    from jsonschema import validate  # type: ignore
+
+    with open(os.path.join(source_dir, "config.schema.json"), encoding="utf-8") as f:
+        schema = json.load(f)
+    validate(instance=config, schema=schema)
+
+
+def compile_policy(config: dict[str, Any], config_hash: str) -> dict[str, Any]:
+    """Compile a validated config into a grading policy.
+
+    Args:
+        config (dict[str, Any]): The validated config.json data.
+        config_hash (str): The hash of config.json's contents.
+
+    Returns:
+        dict[str, Any]: The policy, with the default constants and an index of
+        each extended student's email to their effective constants.
+    """
+    defaults = {key: config[key] for key in CONSTANT_KEYS}
+    defaults.update({key: config.get(key) for key in OPTIONAL_KEYS})
+    # Constants inside a student's extension override the top-level ones
+    index = {
+        email: {**defaults, **extension}
+        for email, extension in config["extensions"].items()
+    }
+    return {
+        "version": POLICY_VERSION,
+        "config_hash": config_hash,
+        "config": config,
+        "defaults": defaults,
+        "index": index,
+    }
+
+
+def load_policy(source_dir: str) -> dict[str, Any]:
+    """Load the grading policy for the config.json in `source_dir`.
+
+    The compiled policy.json is used when it matches config.json; otherwise
+    config.json is fully validated and compiled again.
+
+    Args:
+        source_dir (str): The directory containing config.json.
+
+    Returns:
+        dict[str, Any]: The grading policy.
+    """
+    with open(os.path.join(source_dir, "config.json"), "rb") as f:
+        data = f.read()
+    config_hash = hash_config(data)
+
+    try:
+        with open(os.path.join(source_dir, POLICY_FILE), encoding="utf-8") as f:
+            policy: dict[str, Any] = json.load(f)
+        if (
+            policy.get("version") == POLICY_VERSION
+            and policy.get("config_hash") == config_hash
+        ):
+            return policy
+    except (OSError, ValueError):
+        pass
+
+    config = json.loads(data)
+    validate_config(config, source_dir)
+    return compile_policy(config, config_hash)
+
+
+def write_policy(source_dir: str) -> dict[str, Any]:
+    """Validate config.json and save its compiled policy.json.
+
+    Args:
+        source_dir (str): The directory containing config.json.
+
+    Returns:
+        dict[str, Any]: The compiled policy.
+    """
+    with open(os.path.join(source_dir, "config.json"), "rb") as f:
+        data = f.read()
+    config = json.loads(data)
+    validate_config(config, source_dir)
+    policy = compile_policy(config, hash_config(data))
+
+    # Write then rename so a half-written policy is never loaded
+    path = os.path.join(source_dir, POLICY_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(policy, f, separators=(",", ":"))
+    os.replace(path + ".tmp", path)
+    return policy
+
+
+def resolve_constants(policy: dict[str, Any], emails: list[str]) -> dict[str, Any]:
+    """Look up the grading constants for a submission's users.
+
+    Args:
+        policy (dict[str, Any]): The grading policy.
+        emails (list[str]): The emails of everyone on the submission.
+
+    Returns:
+        dict[str, Any]: The first extended user's constants, otherwise the defaults.
+    """
+    index = policy["index"]
+    for email in emails:
+        if email in index:
+            return index[email]  # type: ignore
+
+    return policy["defaults"]  # type: ignore
+
+
+def main() -> None:
+    """Run the program."""
+    source_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.dirname(__file__)
+    policy = write_policy(source_dir or ".")
+    print(
+        f"Compiled {POLICY_FILE} for {policy['config']['lab_name']} "
+        f"({len(policy['index'])} extension{'' if len(policy['index']) == 1 else 's'})"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -2,21 +2,25 @@
 This file modifies a student's autograder score.
 
 This is done by updating results.json, deducting any late points,
-and capping their submission count.
+capping their submission count, and holding off submissions made too soon.
 
 Authors: Anastasia Kurdia
          Arturo Fonseca
 Date: January 20, 2025
 """
 
-import json
 import os
 from datetime import datetime, timedelta
 from math import ceil
 from typing import Any
 
-from jsonschema import ValidationError, validate  # type: ignore
-from pytz import timezone  # type: ignore
+import jsoncodec
+from bounded_output import cap_results, output_limits
+from metadata import METADATA_FILE, SubmissionMetadata
+from policy import load_policy, resolve_constants
+
+# Starts each block of output this adds to results.json
+BLOCK_START = "\n\n*****************************\n"
 
 
 class SubmissionProcessor:
@@ -27,35 +31,66 @@ class SubmissionProcessor:
     such as submission limits and late penalties.
 
     Attributes:
-        root (str): The root directory of SubmissionProcessor.
+        root (str): The root directory of SubmissionProcessor (/autograder, unless
+            the AUTOGRADER_ROOT environment variable says otherwise).
+        _policy (dict): The compiled grading policy (see policy.py).
         _config (dict): The config.json data.
-        _schema (dict): The schema for config.json.
+        _results_path (str): Where the processed results.json is written.
         _results (dict): The results.json data.
-        _metadata (dict): The metadata for the submission.
+        _output (list[str]): The output to add to results.json, in order.
+        _metadata (SubmissionMetadata): The metadata for the submission.
         _max_submissions (int | None): The maximum number of submissions allowed.
         _max_late_days (int): The maximum number of late days allowed.
         _no_penalty_days (int): The number of days allowed without penalty.
         _penalty (int): The penalty per late day.
+        _rate_limit (dict | None): The minimum interval and/or most submissions
+            per window allowed, if any.
         _min_marks (float): The minimum marks for a submission.
         _max_marks (float): The maximum marks for a submission.
+        _raw_marks (float): The marks from the tests, before any adjustments.
         _total_marks (float): The total marks for the current submission.
         _submit_date (datetime): The submission date.
         _due_date (datetime): The due date.
         _exceeded_limit (bool): Whether one has exceeded the submission limit.
+        _next_graded_at (datetime | None): When a submission will next be
+            graded, if this one came too soon for the rate limit.
     """
 
-    root = "/autograder"
+    root = os.environ.get("AUTOGRADER_ROOT", "/autograder")
+
+    def __init__(
+        self,
+        root: str | None = None,
+        policy: dict[str, Any] | None = None,
+        results: dict[str, Any] | None = None,
+        results_path: str | None = None,
+    ) -> None:
+        """Initialize the SubmissionProcessor instance.
 
-    def __init__(self) -> None:
-        """Initialize the SubmissionProcessor instance."""
+        Args:
+            root (str | None): The submission's root directory (defaults to `root`).
+            policy (dict[str, Any] | None): An already loaded grading policy;
+                if not given, it is loaded for the config.json under `root`.
+            results (dict[str, Any] | None): The test results; if not given,
+                they are read from results/results.json under `root`.
+            results_path (str | None): Where to write the processed results
+                (defaults to results/results.json under `root`).
+        """
         # Setup
-        self._config = self.read_json("source", "config.json")
-        self._schema = self.read_json("source", "config.schema.json")
-        self._results = self.read_json("results", "results.json")
-        self._metadata = self.read_json("submission_metadata.json")
+        self.root = root or SubmissionProcessor.root
+        # Absolute, since write_json joins relative paths onto the class's root
+        self._results_path = os.path.abspath(
+            results_path or os.path.join(self.root, "results", "results.json")
+        )
+        if results is None:
+            results = self.read_json("results", "results.json", root=self.root)
+        self._results = results
+        self._output: list[str] = []
+        self._metadata = SubmissionMetadata.read(os.path.join(self.root, METADATA_FILE))
 
-        # Make sure config.json has valid values
-        self._validate_config()
+        # Load the compiled policy (config.json is validated if it changed since)
+        self._policy = policy or load_policy(os.path.join(self.root, "source"))
+        self._config = self._policy["config"]
 
         # Get constants
         constants = self._get_constants()
@@ -63,37 +98,124 @@ class SubmissionProcessor:
         self._max_late_days: int = constants["max_late_days"]
         self._no_penalty_days: int = constants["no_penalty_days"]
         self._penalty: int = constants["penalty"]
+        self._rate_limit: dict[str, Any] | None = constants["rate_limit"]
 
         # Get submission details
         self._min_marks = 0.0
-        self._max_marks = float(self._metadata["assignment"]["total_points"])
-        self._total_marks = self._calc_score()
-        self._submit_date = datetime.fromisoformat(self._metadata["created_at"])
-        self._due_date = datetime.fromisoformat(
-            self._metadata["assignment"]["due_date"]
-        )
+        self._max_marks = self._metadata.total_points
+        self._raw_marks = self._calc_score()
+        self._total_marks = self._raw_marks
+        self._submit_date = datetime.fromisoformat(self._metadata.created_at)
+        self._due_date = datetime.fromisoformat(self._metadata.due_date)
         self._exceeded_limit = False
+        self._next_graded_at = self._calc_next_graded_at()
 
     def process(self) -> None:
         """Process the student's submission."""
+        self._limit_rate()
         self._limit_submission_count()
         self._apply_late_penalty()
-        self.write_json(self._results, "results", "results.json")
+        # Drop the blocks of an earlier run (when regrading), then add this run's
+        output = self._results.get("output", "").split(BLOCK_START, 1)[0]
+        if output or self._output:
+            self._results["output"] = output + "".join(self._output)
+        cap_results(self._results, *output_limits(self._config))
+        self.write_json(self._results, self._results_path)
+
+    def is_decided(self) -> bool:
+        """Check whether the score is decided whatever the tests' results are.
+
+        It is once the submission limit is exceeded (the previous submission's
+        score counts) or the submission is past the late deadline (it scores 0).
+
+        Returns:
+            bool: Whether the score is already decided.
+        """
+        submission_count = self._metadata.previous_count + 1
+        if self._max_submissions and submission_count > self._max_submissions:
+            return True
+        due_date = self._due_date + timedelta(days=self._no_penalty_days)
+        days_past_due = self._calc_days_between(due_date, self._submit_date)
+        return days_past_due > self._max_late_days
+
+    def is_throttled(self) -> bool:
+        """Check whether the submission came too soon for the rate limit.
+
+        Such a submission isn't graded: the previous submission's score counts.
+
+        Returns:
+            bool: Whether the submission is held off by the rate limit.
+        """
+        return self._next_graded_at is not None
+
+    def summary(self) -> dict[str, Any]:
+        """Summarize this submission's grading outcome.
+
+        Returns:
+            dict[str, Any]: The submitters, submission count, days late, and scores.
+        """
+        due_date = datetime.fromisoformat(self._metadata.due_date)
+        return {
+            "emails": ";".join(self._metadata.emails),
+            "submission_count": self._metadata.previous_count + 1,
+            "days_late": ceil(self._calc_days_between(due_date, self._submit_date)),
+            "raw_score": self._raw_marks,
+            "score": self._total_marks,
+            "exceeded_limit": self._exceeded_limit,
+            "throttled": self.is_throttled(),
+        }
+
+    def _limit_rate(self) -> None:
+        """Keep the previous score if the submission came too soon."""
+        if self._next_graded_at is None:
+            return
+
+        self._total_marks = float(self._metadata.last_score or 0.0)
+        output = (
+            f"{BLOCK_START}"
+            f"Submitted too soon: {self._describe_rate_limit()}.\n"
+            f"This submission wasn't graded, so your previous score "
+            f"({self._total_marks}) stands.\n"
+            f"Your next submission will be graded if made at or after "
+            f"{self._format_date(self._next_graded_at)}.\n"
+        )
+
+        # It was still submitted, so it counts towards the submission limit
+        submission_count = self._metadata.previous_count + 1
+        if self._max_submissions and submission_count < self._max_submissions:
+            output += (
+                f"It still counts as submission {submission_count} "
+                f"of {self._max_submissions}.\n"
+            )
+        elif self._max_submissions and submission_count == self._max_submissions:
+            output += (
+                f"It still counts as submission {submission_count} of "
+                f"{self._max_submissions}, so your previous score is final.\n"
+            )
+        elif self._max_submissions:
+            output += (
+                f"It still counts towards the {self._max_submissions} submissions "
+                f"allowed ({submission_count} submitted).\n"
+            )
+            self._exceeded_limit = True
+
+        # Update the results
+        self._output.append(output)
+        self._results["score"] = self._total_marks
 
     def _limit_submission_count(self) -> None:
         """Update the score if the submission limit exceeded."""
-        # Do nothing if no maximum specified
-        if not self._max_submissions:
+        # Do nothing if no maximum specified, or if already explained as throttled
+        if not self._max_submissions or self._next_graded_at is not None:
             return
 
         # Get their submission count
-        previous_submissions = self._metadata.get("previous_submissions", [])
-        submission_count = len(previous_submissions) + 1  # This submission
+        submission_count = self._metadata.previous_count + 1  # This submission
 
         # If within the limit, just print output
         if submission_count <= self._max_submissions:
             output = (
-                f"\n\n*****************************\n"
+                f"{BLOCK_START}"
                 f"This is submission {submission_count} of {self._max_submissions}.\n"
                 f"After {self._max_submissions} submissions, only submission "
                 f"{self._max_submissions}'s score will count.\n"
@@ -101,22 +223,22 @@ class SubmissionProcessor:
 
         # Otherwise, update their score to their last submission's score and print the output
         else:
-            self._total_marks = float(previous_submissions[-1]["score"])
+            self._total_marks = float(self._metadata.last_score or 0.0)
             output = (
-                f"\n\n*****************************\n"
+                f"{BLOCK_START}"
                 f"{self._max_submissions} submissions exceeded ({submission_count} submitted).\n"
                 f"Only submission {self._max_submissions}'s score ({self._total_marks}) will count.\n"
             )
             self._exceeded_limit = True
 
         # Update the results
-        self._results["output"] = self._results.get("output", "") + output
+        self._output.append(output)
         self._results["score"] = self._total_marks
 
     def _apply_late_penalty(self) -> None:
         """Apply late penalties to the student's submission."""
         # Do nothing if this submission's score won't count anyway
-        if self._exceeded_limit:
+        if self._exceeded_limit or self._next_graded_at is not None:
             return
 
         # Do nothing if submitted before the due date
@@ -126,7 +248,7 @@ class SubmissionProcessor:
 
         # Print submission details
         output = (
-            f"\n\n*****************************\n"
+            f"{BLOCK_START}"
             f"Submission date is: {self._format_date(self._submit_date)}.\n"
         )
         # If they have an extension, push back the due date
@@ -169,68 +291,98 @@ class SubmissionProcessor:
             self._total_marks = max(self._min_marks, self._total_marks - total_penalty)
 
         # Update the results
-        self._results["output"] = self._results.get("output", "") + output
+        self._output.append(output)
         self._results["score"] = self._total_marks
 
-    def _validate_config(self) -> None:
-        """Validate the configuration against the schema.
-
-        Raises:
-            ValidationError: If the configuration does not match the schema.
-        """
-        try:
-            validate(instance=self._config, schema=self._schema)
-        except ValidationError as e:
-            raise e
-
     # HELPERS
 
     def _get_constants(self) -> dict[str, Any]:
-        """Retrieve grading constants from the configuration.
+        """Retrieve grading constants from the policy.
+
+        If a student has an extension, their effective constants are used,
+        otherwise the top-level constants are the default.
 
         Returns:
             dict[str, Any]: A dictionary containing the grading constants.
         """
-        constants: dict[str, Any] = {}
-        ext_constants = self._get_extension_constants()
-        keys = {"max_submissions", "max_late_days", "no_penalty_days", "penalty"}
+        return resolve_constants(self._policy, self._metadata.emails)
 
-        for key in keys:
-            # If a student has an extension, look for any keys present in their dictionary
-            # Otherwise, assume top-level constants are the default
-            if key in ext_constants:
-                value = ext_constants[key]
-            else:
-                value = self._config[key]
+    def _calc_next_graded_at(self) -> datetime | None:
+        """Find when a submission will next be graded, if this one came too soon.
 
-            constants[key] = value
+        Submissions that came too soon count towards the rate limit too, so
+        submitting again early only pushes the time back.
+
+        Returns:
+            datetime | None: The time (rounded up to the minute, as it's shown),
+            or None if this submission is within the rate limit.
+        """
+        times = self._metadata.recent_times
+        if not self._rate_limit or not times:
+            return None
+        allowed_at = self._calc_allowed_at(times)
+        if allowed_at is None or allowed_at <= self._submit_date:
+            return None
 
-        return constants
+        next_at = self._calc_allowed_at(times + [self._metadata.created_at])
+        rounded = next_at.replace(second=0, microsecond=0)  # type: ignore
+        return rounded if rounded == next_at else rounded + timedelta(minutes=1)
 
-    def _get_extension_constants(self) -> dict[str, Any]:
-        """Retrieve the extension constants for a student.
+    def _calc_allowed_at(self, times: list[str]) -> datetime | None:
+        """Calculate when the rate limit allows the submission after `times`.
+
+        Only the last `max_submissions` times are parsed, however long the
+        student's history is.
+
+        Args:
+            times (list[str]): The submission times (ISO 8601), oldest first.
 
         Returns:
-            dict[str, Any]: A dictionary containing the extension constants
-            if an extension is found, otherwise an empty dictionary.
+            datetime | None: The earliest time allowed, or None if any time is.
         """
-        submission_emails = [user["email"] for user in self._metadata["users"]]
-
-        for email in submission_emails:
-            if email in self._config["extensions"]:
-                return self._config["extensions"][email]  # type: ignore
+        limit: dict[str, Any] = self._rate_limit  # type: ignore
+        allowed_at = []
+        if "min_interval_minutes" in limit:
+            last = datetime.fromisoformat(times[-1])
+            allowed_at.append(last + timedelta(minutes=limit["min_interval_minutes"]))
+        count = limit.get("max_submissions")
+        if count and len(times) >= count:
+            # The next one would make `count` + 1 in a window starting here
+            start = datetime.fromisoformat(times[-count])
+            allowed_at.append(start + timedelta(minutes=limit["window_minutes"]))
+        return max(allowed_at, default=None)
+
+    def _describe_rate_limit(self) -> str:
+        """Describe the rate limit for the student.
 
-        return {}
+        Returns:
+            str: For example "at most 3 submissions every 60 minutes".
+        """
+        limit: dict[str, Any] = self._rate_limit  # type: ignore
+        rules = []
+        if "min_interval_minutes" in limit:
+            minutes = limit["min_interval_minutes"]
+            rules.append(
+                f"submissions must be at least {minutes:g} "
+                f"minute{self._pluralize(minutes)} apart"
+            )
+        if "max_submissions" in limit:
+            count, minutes = limit["max_submissions"], limit["window_minutes"]
+            rules.append(
+                f"at most {count} submission{self._pluralize(count)} every "
+                f"{minutes:g} minute{self._pluralize(minutes)}"
+            )
+        return " and ".join(rules)
 
     def _calc_score(self) -> float:
-        """Calculate a student's score by looking at their results.json.
+        """Calculate a student's score from their tests in results.json.
+
+        The top-level score is ignored, since a regraded results.json already
+        has the late penalty and submission limit applied to it.
 
         Returns:
             float: Their score.
         """
-        if "score" in self._results:
-            return float(self._results["score"])
-
         return float(sum(test.get("score", 0) for test in self._results["tests"]))
 
     @staticmethod
@@ -257,6 +409,9 @@ class SubmissionProcessor:
         Returns:
             str: The formatted date string.
         """
+        # Only late or throttled submissions show dates, so don't pay for pytz otherwise
+        from pytz import timezone  # type: ignore
+
         date = date.astimezone(timezone("America/Chicago"))
         return date.strftime("%B %d at %-I:%M %p (UTC%z)")
 
@@ -273,32 +428,43 @@ class SubmissionProcessor:
         return "" if number == 1 else "s"
 
     @staticmethod
-    def read_json(*path_args: str) -> dict[str, Any]:
+    def read_json(*path_args: str, root: str | None = None) -> dict[str, Any]:
         """Read and parse a JSON file from the specified path.
 
         Args:
             *path_args (str): Components of the file path.
+            root (str | None): The directory the path is relative to
+                (defaults to `SubmissionProcessor.root`).
 
         Returns:
             dict[str, Any]: The parsed JSON content as a dictionary.
         """
-        with open(
-            os.path.join(SubmissionProcessor.root, *path_args), encoding="utf-8"
-        ) as f:
-            return json.load(f)  # type: ignore
+        return jsoncodec.read(  # type: ignore
+            os.path.join(root or SubmissionProcessor.root, *path_args)
+        )
 
     @staticmethod
-    def write_json(json_dict: dict[str, Any], *path_args: str) -> None:
+    def write_json(
+        json_dict: dict[str, Any], *path_args: str, root: str | None = None
+    ) -> None:
         """Write a dictionary to a JSON file at the specified path.
 
+        The dictionary is serialized in memory (as compact JSON, see jsoncodec.py)
+        and written in one call to a temporary file, which then replaces the
+        target, so the file is never seen half-written. It isn't streamed, since
+        output_limits already caps how large results.json can get.
+
         Args:
             json_dict (dict[str, Any]): The dictionary to be written to the JSON file.
             *path_args (str): Components of the file path.
+            root (str | None): The directory the path is relative to
+                (defaults to `SubmissionProcessor.root`).
         """
-        with open(
-            os.path.join(SubmissionProcessor.root, *path_args), "w", encoding="utf-8"
-        ) as f:
-            json.dump(json_dict, f, indent=2)
+        path = os.path.join(root or SubmissionProcessor.root, *path_args)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(jsoncodec.dumps(json_dict))
+        os.replace(temp_path, path)
 
 
 def main() -> None:
@@ -0,0 +1,156 @@
+"""
+This file profiles chosen tests, to show students where their code spends its time.
+
+A test opts in with the `profile` decorator (used like `@weight`), or by its
+number in config.json's `profile`. It then runs under cProfile and tracemalloc,
+and its output in results.json ends with the student's slowest functions (only
+those in the `files/` directory) and the peak memory allocated. Tests that
+don't opt in are left untouched, so profiling costs nothing when it is off.
+
+Example:
+    @profile(top=5)
+    @weight(10)
+    @number("4")
+    def test_get_dogs_by_breed(self) -> None:
+"""
+
+import functools
+import os
+from typing import Any, Callable
+
+from bounded_output import truncate
+
+DEFAULT_TOP = 10
+# The most characters a profile adds to a test's output
+PROFILE_OUTPUT_LIMIT = 2_000
+
+
+def profile(
+    top: int = DEFAULT_TOP,
+) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Profile a test, listing the student's `top` slowest functions in its output.
+
+    Args:
+        top (int): How many functions to list.
+
+    Returns:
+        Callable: The decorator.
+    """
+
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        func.__profile__ = top  # type: ignore
+        return func
+
+    return decorator
+
+
+def profiled_tests(config: dict[str, Any]) -> dict[str, int]:
+    """Return the tests config.json asks to profile.
+
+    Args:
+        config (dict[str, Any]): The config.json data.
+
+    Returns:
+        dict[str, int]: How many functions to list, by test number.
+    """
+    settings = config.get("profile", {})
+    top = settings.get("top", DEFAULT_TOP)
+    return {str(number): top for number in settings.get("tests", [])}
+
+
+def instrument(
+    cases: list[Any], numbers: dict[str, int], files_dir: str = "files"
+) -> None:
+    """Make the test cases that opted in run under the profiler.
+
+    Args:
+        cases (list[Any]): The test cases.
+        numbers (dict[str, int]): Tests to profile (by number) from config.json,
+            in addition to those with the `profile` decorator.
+        files_dir (str): The directory with the student's code.
+    """
+    files_dir = os.path.abspath(files_dir)
+    for case in cases:
+        method = getattr(case, case._testMethodName, None)
+        top = getattr(method, "__profile__", None)
+        if top is None:
+            top = numbers.get(str(getattr(method, "__number__", None)))
+        if method is not None and top is not None:
+            # An instance attribute shadows the method for this test case only
+            setattr(case, case._testMethodName, _profiled(method, top, files_dir))
+
+
+def _profiled(method: Callable[[], Any], top: int, files_dir: str) -> Callable[[], Any]:
+    """Wrap a bound test method to run it under cProfile and tracemalloc.
+
+    Args:
+        method (Callable[[], Any]): The bound test method.
+        top (int): How many functions to list.
+        files_dir (str): The directory with the student's code.
+
+    Returns:
+        Callable[[], Any]: The wrapped test method.
+    """
+
+    @functools.wraps(method)
+    def wrapper() -> Any:
+        import cProfile
+        import tracemalloc
+
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+        else:
+            tracemalloc.start()
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(method)
+        finally:
+            peak = tracemalloc.get_traced_memory()[1]
+            if not tracing:
+                tracemalloc.stop()
+            # Decorators like @partial_credit set the score on the original function
+            wrapper.__dict__.update(getattr(method, "__func__", method).__dict__)
+            print(report(profiler, peak, top, files_dir))
+
+    return wrapper
+
+
+def report(profiler: Any, peak: int, top: int, files_dir: str) -> str:
+    """Summarize a profile: the student's slowest functions and the peak memory.
+
+    Args:
+        profiler (cProfile.Profile): The test's profile.
+        peak (int): The peak memory allocated, in bytes.
+        top (int): How many functions to list.
+        files_dir (str): The directory with the student's code.
+
+    Returns:
+        str: The summary (at most `PROFILE_OUTPUT_LIMIT` characters).
+    """
+    import pstats
+
+    stats = pstats.Stats(profiler).stats  # type: ignore
+    hotspots = sorted(
+        (
+            (own, total, calls, function, filename, line)
+            for (filename, line, function), (_, calls, own, total, _) in stats.items()
+            if os.path.abspath(filename).startswith(files_dir + os.sep)
+        ),
+        reverse=True,
+    )[:top]
+
+    lines = ["", "Profile (your slowest functions, by time spent in each):"]
+    lines.append(f"{'calls':>10} {'own (s)':>9} {'total (s)':>9}  function")
+    for own, total, calls, function, filename, line in hotspots:
+        lines.append(
+            f"{calls:>10} {own:>9.4f} {total:>9.4f}  "
+            f"{function} ({os.path.basename(filename)}:{line})"
+        )
+    if not hotspots:
+        lines.append("(none of your functions were called)")
+    if peak < 1024 * 1024:
+        lines.append(f"Peak memory allocated: {peak / 1024:.1f} KB")
+    else:
+        lines.append(f"Peak memory allocated: {peak / (1024 * 1024):.1f} MB")
+    return truncate("\n".join(lines), PROFILE_OUTPUT_LIMIT)
@@ -0,0 +1,190 @@
+"""
+This file caches test results for identical submissions.
+
+The cache key hashes everything that can change a submission's test results:
+the staged student files, the tests, the data files, config.json and the
+grader itself, plus the submission's random seed when the tests use one
+(see oracle.py). Resubmitting byte-identical files reuses the cached test
+results, so only the late-penalty and submission-cap pass runs again. Results
+with a test that ran out of time or memory aren't cached, and neither are the
+results of tests that time the student's code (see scaling.py), since another
+run could go differently. The hit and miss counts are shared by every grader
+using the cache, and updated under a lock.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import sys
+from typing import Any
+
+# Files that change between runs without changing the test results
+VOLATILE_FILES = {"policy.json", "test_durations.json"}
+# Tests that use this run on data generated for each submission
+SEED_MARKER = b"submission_seed("
+# Tests that use these time the student's code, so their results can't be reused
+TIMED_MARKERS = (b"@scaling(", b"@scaling.scaling(")
+# In the output of tests that failed by running out of time or memory
+BUDGET_FAILURES = (
+    "exceeded its budget of",
+    "does it run slow code outside of functions?",
+)
+
+
+class ResultCache:
+    """A class to store test results by the hash of what produced them.
+
+    Attributes:
+        directory (str): Where cached results and statistics are stored.
+        hits (int): How many lookups found cached results (across runs).
+        misses (int): How many lookups found nothing (across runs).
+    """
+
+    def __init__(self, directory: str) -> None:
+        """Initialize the ResultCache instance.
+
+        Args:
+            directory (str): Where cached results and statistics are stored.
+        """
+        self.directory = os.path.abspath(directory)
+        os.makedirs(directory, exist_ok=True)
+        stats = self._read(os.path.join(directory, "stats.json")) or {}
+        self.hits: int = stats.get("hits", 0)
+        self.misses: int = stats.get("misses", 0)
+
+    def key(self, source_dir: str, root: str | None = None) -> str | None:
+        """Hash every file that can change the test results.
+
+        Call this after the student's files are staged into the source directory.
+        If a test calls `submission_seed`, the submission's seed is hashed too.
+
+        Args:
+            source_dir (str): The autograder source directory.
+            root (str | None): The submission's root directory, for its seed
+                (defaults to `SubmissionProcessor.root`).
+
+        Returns:
+            str | None: The cache key, or None if a test is timed (with
+            `@scaling`), so the results mustn't be cached.
+        """
+        digest = hashlib.sha256(sys.version.encode())
+        seeded = False
+        for directory, dirs, files in os.walk(source_dir):
+            # Skip bytecode, prebuilt caches, hidden directories (like .git) and this cache
+            dirs[:] = sorted(
+                d
+                for d in dirs
+                if not d.startswith(("__", "."))
+                and os.path.abspath(os.path.join(directory, d)) != self.directory
+            )
+            for name in sorted(files):
+                if name in VOLATILE_FILES or name.endswith(".tmp"):
+                    continue
+                path = os.path.join(directory, name)
+                relative_path = os.path.relpath(path, source_dir)
+                digest.update(relative_path.encode() + b"\0")
+                with open(path, "rb") as f:
+                    data = f.read()
+                digest.update(hashlib.sha256(data).digest())
+                if relative_path.startswith("tests" + os.sep):
+                    if any(marker in data for marker in TIMED_MARKERS):
+                        return None
+                    seeded = seeded or SEED_MARKER in data
+        if seeded:
+            from oracle import submission_seed
+
+            digest.update(b"seed\0" + str(submission_seed(root)).encode())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        """Look up the test results cached for a key.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            dict[str, Any] | None: The cached results, if any.
+        """
+        results = self._read(self._path(key))
+        self._count(hit=results is not None)
+        return results
+
+    def put(self, key: str, results: dict[str, Any]) -> None:
+        """Cache the test results for a key, unless a test ran out of time or memory.
+
+        Args:
+            key (str): The cache key.
+            results (dict[str, Any]): The test results.
+        """
+        for test in results.get("tests", []):
+            output = test.get("output", "")
+            if any(failure in output for failure in BUDGET_FAILURES):
+                return
+        os.makedirs(os.path.dirname(self._path(key)), exist_ok=True)
+        self._write(self._path(key), results)
+
+    def stats(self) -> dict[str, int]:
+        """Return the cache's hit and miss counts.
+
+        Returns:
+            dict[str, int]: The hits and misses.
+        """
+        return {"hits": self.hits, "misses": self.misses}
+
+    def _count(self, hit: bool) -> None:
+        """Add a lookup to the hit and miss counts in stats.json.
+
+        Graders running at once share the counts, so they are read and written
+        back under a lock (on a separate file, since stats.json is replaced).
+
+        Args:
+            hit (bool): Whether the lookup found cached results.
+        """
+        stats_path = os.path.join(self.directory, "stats.json")
+        with open(stats_path + ".lock", "w", encoding="utf-8") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            stats = self._read(stats_path) or {}
+            self.hits = stats.get("hits", 0) + hit
+            self.misses = stats.get("misses", 0) + (not hit)
+            self._write(stats_path, self.stats())
+
+    def _path(self, key: str) -> str:
+        """Return where the results for a key are stored.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            str: The results' file path.
+        """
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    @staticmethod
+    def _read(path: str) -> dict[str, Any] | None:
+        """Read a JSON file, if it exists and is valid.
+
+        Args:
+            path (str): The file to read.
+
+        Returns:
+            dict[str, Any] | None: Its content, if any.
+        """
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)  # type: ignore
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _write(path: str, json_dict: dict[str, Any]) -> None:
+        """Write a JSON file atomically (write then rename).
+
+        Args:
+            path (str): The file to write.
+            json_dict (dict[str, Any]): Its content.
+        """
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(json_dict, f, separators=(",", ":"))
+        os.replace(temp_path, path)
@@ -1,10 +1,35 @@
 """Unit tests."""
 
+import argparse
+import os
 import unittest
 
-from gradescope_utils.autograder_utils.json_test_runner import JSONTestRunner
+from bounded_output import output_limits
+from budget import Budget
+from parallel_runner import ParallelJSONTestRunner
+from processor import SubmissionProcessor
+from profiling import profiled_tests
+from student_loader import import_budget, load_student_modules
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the unit tests.")
+    parser.add_argument(
+        "--workers", type=int, default=1, help="worker processes to run tests in"
+    )
+    args = parser.parse_args()
+
+    config = SubmissionProcessor.read_json("source", "config.json")
+    imports = load_student_modules(config["files_needed"], import_budget(config))
     suite = unittest.defaultTestLoader.discover("tests")
-    with open("/autograder/results/results.json", "w", encoding="utf-8") as f:
-        JSONTestRunner(visibility="visible", stream=f).run(suite)
+    results_path = os.path.join(SubmissionProcessor.root, "results", "results.json")
+    with open(results_path, "w", encoding="utf-8") as f:
+        ParallelJSONTestRunner(
+            visibility="visible",
+            stream=f,
+            workers=args.workers,
+            durations_path="test_durations.json",
+            budget=Budget.from_config(config),
+            output_limit=output_limits(config)[0],
+            profile=profiled_tests(config),
+            imports=imports,
+        ).run(suite)
@@ -0,0 +1,213 @@
+"""
+This file grades how a student's function scales with the size of its input.
+
+The `scaling` decorator turns a test into a benchmark: the student's function
+and a reference implementation are timed on the test's dataset repeated 1x to
+100x, an empirical complexity (the exponent k in time ~ n^k) is fitted for
+each, and points are only awarded if the student's code is within the
+configured thresholds of the reference. The timings are printed in the test's output.
+Before each larger input, its time is projected from the exponent fitted so
+far, and code projected to go over the time limit fails without running it
+(as does code that goes over it).
+
+Example:
+    @scaling(
+        weight=5,
+        data="dogs",
+        func=lambda dogs: get_dogs_by_breed(dogs, "Beagle"),
+        reference=lambda dogs: [dog for dog in dogs if "beagle" in dog[4].lower()],
+    )
+    @number("10")
+    def test_get_dogs_by_breed_scaling(self) -> None:
+        \"\"\"get_dogs_by_breed scales linearly\"\"\"
+"""
+
+import functools
+import math
+import time
+from typing import Any, Callable
+
+DEFAULT_FACTORS = (1, 10, 100)
+
+
+def scale(rows: list[Any], factor: int) -> list[Any]:
+    """Make a dataset `factor` times larger by repeating its rows.
+
+    Args:
+        rows (list[Any]): The dataset.
+        factor (int): How many times larger to make it.
+
+    Returns:
+        list[Any]: The larger dataset.
+    """
+    return list(rows) * factor
+
+
+def measure(func: Callable[[Any], Any], data: Any, min_time: float = 0.05) -> float:
+    """Time one call of a function, repeating fast calls for a stable measurement.
+
+    Args:
+        func (Callable[[Any], Any]): The function to time.
+        data (Any): The function's input.
+        min_time (float): The least total time to spend measuring.
+
+    Returns:
+        float: The fastest time per call, in seconds.
+    """
+    best = math.inf
+    calls = 1
+    spent = 0.0
+    while spent < min_time:
+        start = time.perf_counter()
+        for _ in range(calls):
+            func(data)
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed / calls)
+        spent += elapsed
+        calls *= 2
+    return best
+
+
+def fit_exponent(sizes: list[int], times: list[float]) -> float:
+    """Fit the exponent k in time ~ size^k (a least-squares fit in log-log space).
+
+    Args:
+        sizes (list[int]): The input sizes.
+        times (list[float]): The time taken for each size.
+
+    Returns:
+        float: The fitted exponent (0 if there are fewer than two sizes).
+    """
+    if len(sizes) < 2:
+        return 0.0
+    xs = [math.log(size) for size in sizes]
+    ys = [math.log(max(seconds, 1e-9)) for seconds in times]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    covariance = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+    variance = sum((x - mean_x) ** 2 for x in xs)
+    return covariance / variance
+
+
+def project(size: int, seconds: float, next_size: int, exponent: float) -> float:
+    """Project the time for a larger input from time ~ size^exponent.
+
+    Args:
+        size (int): The largest input size timed so far.
+        seconds (float): The time it took.
+        next_size (int): The input size to project the time for.
+        exponent (float): The exponent fitted so far.
+
+    Returns:
+        float: The projected time, in seconds.
+    """
+    return seconds * (next_size / size) ** exponent
+
+
+def scaling(
+    weight: float,
+    data: str,
+    func: Callable[[Any], Any],
+    reference: Callable[[Any], Any],
+    factors: tuple[int, ...] = DEFAULT_FACTORS,
+    max_exponent_gap: float = 0.3,
+    max_ratio: float = 5.0,
+    time_limit: float = 2.0,
+) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Turn a test into a scaling benchmark worth `weight` points.
+
+    Use it like `@weight`; the decorated test's body is not run.
+
+    Args:
+        weight (float): The points awarded if the student's code scales well.
+        data (str): The name of the test case attribute holding the dataset.
+        func (Callable[[Any], Any]): Calls the student's function on a dataset.
+        reference (Callable[[Any], Any]): Calls the reference implementation on a dataset.
+        factors (tuple[int, ...]): How many times larger than the dataset to test.
+        max_exponent_gap (float): How much higher than the reference's the
+            student's fitted exponent may be.
+        max_ratio (float): How many times slower than the reference the
+            student's code may be on the largest input.
+        time_limit (float): Stop growing the input once one call takes (or is
+            projected to take) this long, which fails the test.
+
+    Returns:
+        Callable: The decorator.
+    """
+
+    def decorator(test: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(test)
+        def wrapper(self: Any) -> None:
+            wrapper.__score__ = 0.0  # type: ignore
+            rows = getattr(self, data)
+            sizes: list[int] = []
+            student_times: list[float] = []
+            reference_times: list[float] = []
+            projected = None
+
+            print(f"{'size':>10} {'yours (ms)':>12} {'reference (ms)':>15}")
+            for factor in factors:
+                # Once there's a trend, don't run what would blow the time limit
+                if len(sizes) > 1:
+                    exponent = fit_exponent(sizes, student_times)
+                    projected = project(
+                        sizes[-1], student_times[-1], len(rows) * factor, exponent
+                    )
+                    if projected > time_limit:
+                        break
+                    projected = None
+                scaled = scale(rows, factor)
+                student_time = measure(func, scaled)
+                reference_time = measure(reference, scaled)
+                sizes.append(len(scaled))
+                student_times.append(student_time)
+                reference_times.append(reference_time)
+                print(
+                    f"{len(scaled):>10} {student_time * 1000:>12.3f} "
+                    f"{reference_time * 1000:>15.3f}"
+                )
+                if student_time > time_limit:
+                    break
+
+            too_slow = []
+            ratio = student_times[-1] / max(reference_times[-1], 1e-9)
+            # A slope needs two sizes; with one, only the time itself is graded
+            if len(sizes) > 1:
+                student_exponent = fit_exponent(sizes, student_times)
+                reference_exponent = fit_exponent(sizes, reference_times)
+                print(
+                    f"Your code grows like n^{student_exponent:.2f} "
+                    f"(reference: n^{reference_exponent:.2f}) and is {ratio:.1f}x "
+                    f"the reference's time on {sizes[-1]} items."
+                )
+                if student_exponent > reference_exponent + max_exponent_gap:
+                    too_slow.append("grows faster than the reference")
+            else:
+                print(
+                    f"Your code is {ratio:.1f}x the reference's time on "
+                    f"{sizes[-1]} items (only one size was timed, so how it "
+                    "grows isn't fitted)."
+                )
+
+            for size, seconds in zip(sizes, student_times):
+                if seconds > time_limit:
+                    too_slow.append(
+                        f"took {seconds:.1f}s on {size} items "
+                        f"(over the {time_limit:g}s limit)"
+                    )
+            if projected is not None:
+                too_slow.append(
+                    f"would take about {projected:.1f}s on {len(rows) * factor} "
+                    f"items (over the {time_limit:g}s limit)"
+                )
+            if ratio > max_ratio:
+                too_slow.append(
+                    f"is more than {max_ratio:g}x slower than the reference"
+                )
+            wrapper.__score__ = 0.0 if too_slow else weight  # type: ignore
+            assert not too_slow, "Your code " + " and ".join(too_slow)
+
+        wrapper.__weight__ = weight  # type: ignore
+        return wrapper
+
+    return decorator
@@ -3,3 +3,13 @@
 apt-get install -y python3 python3-pip python3-dev
 
 pip3 install -r /autograder/source/requirements.txt
+
+# Validate config.json once and compile it into policy.json for fast grading
+python3 /autograder/source/policy.py /autograder/source
+
+# Precompile bytecode for the tests and dependencies so each submission doesn't pay for it
+python3 -m compileall -q -j 0 /autograder/source
+python3 -m compileall -q -j 0 "$(python3 -c 'import sysconfig; print(sysconfig.get_paths()["purelib"])')"
+
+# Prebuild the data files' caches so the tests don't parse them on every submission
+cd /autograder/source && python3 datasets.py files/*.csv files/*.json
@@ -0,0 +1,578 @@
+"""
+This file indexes submissions to find the most similar earlier ones.
+
+Each submitted Python file is tokenized with names, strings and numbers
+normalized (so renaming variables or editing comments changes nothing), cut
+into overlapping runs of tokens ("shingles"), and summarized by a MinHash
+signature. Signatures are stored in a SQLite database with locality-sensitive
+hashing (LSH) bands, so the indexed submissions most similar to a new one are
+found by looking up its bands rather than comparing it with every submission.
+
+The index is for instructors only: matches are stored in the database and
+printed to the grader's stdout (which students don't see), and never added to
+results.json. grade.py updates it for each submission when given a database
+(`--similarity-db` or the AUTOGRADER_SIMILARITY_DB environment variable).
+
+Usage:
+    python3 similarity.py build EXPORT_DIR --db PATH [--source DIR]
+                                [--workers N] [--top K]
+    python3 similarity.py query --db PATH [SUBMISSION] [--top K]
+"""
+
+import argparse
+import hashlib
+import io
+import keyword
+import operator
+import os
+import random
+import sqlite3
+import struct
+import time
+import token
+import tokenize
+import zlib
+from array import array
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Any
+
+SHINGLE_SIZE = 5
+PERMUTATIONS = 128
+BANDS = 32  # of PERMUTATIONS // BANDS rows each
+TOP_K = 5
+# The most files looked at per LSH bucket
+BUCKET_LIMIT = 50
+# How long grading waits for another grader's lock before skipping the index
+GRADING_TIMEOUT = 2.0
+# A prime just under 2**32, so signatures fit in 32 bits
+PRIME = 4_294_967_291
+_rng = random.Random(0)
+# (a, b) of each hash function h(x) = (a * x + b) % PRIME, the same in every run
+HASHES = [
+    (_rng.randrange(1, 2**31), _rng.randrange(0, PRIME)) for _ in range(PERMUTATIONS)
+]
+# Set in build()'s workers if NumPy is installed (grading doesn't pay to import it)
+numpy: Any = None
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    submission TEXT NOT NULL,
+    emails TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    file TEXT NOT NULL,
+    tokens INTEGER NOT NULL,
+    signature BLOB NOT NULL,
+    UNIQUE (submission, file)
+);
+CREATE TABLE IF NOT EXISTS bands (
+    band INTEGER NOT NULL,
+    key INTEGER NOT NULL,
+    file_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS bands_key ON bands (band, key, file_id);
+CREATE TABLE IF NOT EXISTS matches (
+    file_id INTEGER NOT NULL,
+    other_id INTEGER NOT NULL,
+    similarity REAL NOT NULL,
+    PRIMARY KEY (file_id, other_id)
+);
+"""
+
+
+def normalize(source: str) -> list[str]:
+    """Tokenize Python source, normalizing what doesn't change its structure.
+
+    Comments and blank lines are dropped, and names (other than keywords),
+    strings and numbers are replaced by placeholders. Source that can't be
+    tokenized is normalized up to where it fails.
+
+    Args:
+        source (str): The Python source.
+
+    Returns:
+        list[str]: The normalized tokens.
+    """
+    tokens = []
+    try:
+        for tok in tokenize.generate_tokens(io.StringIO(source).readline):
+            if tok.type in (token.COMMENT, token.NL, token.ENCODING, token.ENDMARKER):
+                continue
+            if tok.type == token.NAME:
+                tokens.append(tok.string if keyword.iskeyword(tok.string) else "N")
+            elif tok.type == token.STRING or tok.type == getattr(
+                token, "FSTRING_START", None
+            ):
+                tokens.append("S")
+            elif tok.type == token.NUMBER:
+                tokens.append("0")
+            elif tok.type in (token.NEWLINE, token.INDENT, token.DEDENT):
+                tokens.append(token.tok_name[tok.type])
+            else:
+                tokens.append(tok.string)
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        pass
+    return tokens
+
+
+def shingles(tokens: list[str], size: int = SHINGLE_SIZE) -> set[int]:
+    """Hash every run of `size` consecutive tokens.
+
+    Args:
+        tokens (list[str]): The normalized tokens.
+        size (int): The tokens per shingle.
+
+    Returns:
+        set[int]: The shingles' 32-bit hashes.
+    """
+    return {
+        zlib.crc32("\x00".join(tokens[i : i + size]).encode())
+        for i in range(len(tokens) - size + 1)
+    }
+
+
+def signature(hashes: set[int]) -> list[int]:
+    """Compute the MinHash signature of a set of shingles.
+
+    The fraction of equal positions in two signatures estimates the Jaccard
+    similarity of their shingles.
+
+    Args:
+        hashes (set[int]): The shingles' hashes (at least one).
+
+    Returns:
+        list[int]: The minimum of each hash function over the shingles.
+    """
+    if numpy is not None:
+        # Same values: a < 2**31 and x < 2**32, so a * x + b fits in 64 bits
+        values = numpy.fromiter(hashes, dtype=numpy.uint64, count=len(hashes))
+        a, b = (numpy.array(column, dtype=numpy.uint64) for column in zip(*HASHES))
+        return ((a[:, None] * values + b[:, None]) % PRIME).min(axis=1).tolist()
+    return [min((a * x + b) % PRIME for x in hashes) for a, b in HASHES]
+
+
+def band_keys(sig: list[int]) -> list[int]:
+    """Hash each band of a signature, for LSH.
+
+    Two signatures share a band key when all of that band's rows are equal,
+    which becomes likely as their similarity goes up.
+
+    Args:
+        sig (list[int]): The signature.
+
+    Returns:
+        list[int]: Each band's key (a signed 64-bit integer, for SQLite).
+    """
+    rows = PERMUTATIONS // BANDS
+    return [
+        int.from_bytes(
+            hashlib.blake2b(
+                struct.pack(f"<{rows}I", *sig[band * rows : (band + 1) * rows]),
+                digest_size=8,
+            ).digest(),
+            "big",
+            signed=True,
+        )
+        for band in range(BANDS)
+    ]
+
+
+def similarity(first: list[int] | array, second: list[int] | array) -> float:
+    """Estimate the similarity of two files from their signatures.
+
+    Args:
+        first (list[int] | array): A signature.
+        second (list[int] | array): Another signature.
+
+    Returns:
+        float: The estimated Jaccard similarity, from 0 to 1.
+    """
+    return sum(map(operator.eq, first, second)) / PERMUTATIONS
+
+
+def fingerprint(path: str) -> tuple[int, list[int]] | None:
+    """Read a submitted file and compute its signature.
+
+    Args:
+        path (str): The file.
+
+    Returns:
+        tuple[int, list[int]] | None: The number of tokens and the signature,
+        or None if the file is missing or too short to compare.
+    """
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            tokens = normalize(f.read())
+    except OSError:
+        return None
+    hashes = shingles(tokens)
+    if not hashes:
+        return None
+    return len(tokens), signature(hashes)
+
+
+class SimilarityIndex:
+    """A class to store submissions' signatures and find similar ones.
+
+    Attributes:
+        path (str): The SQLite database.
+        _db (sqlite3.Connection): The open database.
+    """
+
+    def __init__(self, path: str, timeout: float = 60.0) -> None:
+        """Initialize the SimilarityIndex instance, creating the database if needed.
+
+        Args:
+            path (str): The SQLite database.
+            timeout (float): How long to wait for another process's lock.
+        """
+        self.path = path
+        # Several graders may update the same index at once
+        self._db = sqlite3.connect(path, timeout=timeout)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        """Close the database."""
+        self._db.close()
+
+    def add(
+        self,
+        submission: str,
+        emails: list[str],
+        created_at: str,
+        fingerprints: dict[str, tuple[int, list[int]]],
+        top: int = TOP_K,
+    ) -> dict[str, list[tuple[str, str, float]]]:
+        """Add a submission's files and record their most similar earlier ones.
+
+        Args:
+            submission (str): The submission's name.
+            emails (list[str]): The submitters' emails.
+            created_at (str): When the submission was made (ISO 8601).
+            fingerprints (dict[str, tuple[int, list[int]]]): Each file's number
+                of tokens and signature, by file name.
+            top (int): How many matches to record per file.
+
+        Returns:
+            dict[str, list[tuple[str, str, float]]]: Each file's matches, as
+            the other submission's name, its emails and the similarity.
+        """
+        emails_text = ";".join(sorted(emails))
+        created_at = (
+            datetime.fromisoformat(created_at).astimezone(timezone.utc).isoformat()
+        )
+        found = {}
+        with self._db:
+            for file, (tokens, sig) in fingerprints.items():
+                # Regrading a submission replaces its earlier entry
+                for (old_id,) in self._db.execute(
+                    "SELECT id FROM files WHERE submission = ? AND file = ?",
+                    (submission, file),
+                ).fetchall():
+                    self._db.execute("DELETE FROM bands WHERE file_id = ?", (old_id,))
+                    self._db.execute(
+                        "DELETE FROM matches WHERE file_id = ? OR other_id = ?",
+                        (old_id, old_id),
+                    )
+                    self._db.execute("DELETE FROM files WHERE id = ?", (old_id,))
+                cursor = self._db.execute(
+                    "INSERT INTO files (submission, emails, created_at, file, tokens, "
+                    "signature) VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        submission,
+                        emails_text,
+                        created_at,
+                        file,
+                        tokens,
+                        array("I", sig).tobytes(),
+                    ),
+                )
+                file_id = cursor.lastrowid
+                keys = band_keys(sig)
+                matches = self._similar(file_id, file, emails_text, sig, keys, top)
+                self._db.executemany(
+                    "INSERT INTO bands (band, key, file_id) VALUES (?, ?, ?)",
+                    [(band, key, file_id) for band, key in enumerate(keys)],
+                )
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO matches VALUES (?, ?, ?)",
+                    [(file_id, other, score) for other, _, _, score in matches[:top]],
+                )
+                found[file] = [
+                    (name, other_emails, score)
+                    for _, name, other_emails, score in matches[:top]
+                ]
+        return found
+
+    def matches(
+        self, submission: str | None = None, top: int = 20
+    ) -> list[tuple[str, str, str, str, str, float]]:
+        """Return the recorded matches, most similar first.
+
+        Args:
+            submission (str | None): Only this submission's matches, if given.
+            top (int): The most matches to return.
+
+        Returns:
+            list[tuple[str, str, str, str, str, float]]: Each match's file, the
+            submission and its emails, the earlier submission and its emails,
+            and the similarity.
+        """
+        query = (
+            "SELECT f.file, f.submission, f.emails, o.submission, o.emails, "
+            "m.similarity FROM matches m JOIN files f ON f.id = m.file_id "
+            "JOIN files o ON o.id = m.other_id"
+        )
+        parameters: tuple[Any, ...] = ()
+        if submission is not None:
+            query += " WHERE f.submission = ?"
+            parameters = (submission,)
+        query += " ORDER BY m.similarity DESC LIMIT ?"
+        return self._db.execute(query, parameters + (top,)).fetchall()
+
+    def _similar(
+        self,
+        file_id: int | None,
+        file: str,
+        emails: str,
+        sig: list[int],
+        keys: list[int],
+        top: int,
+    ) -> list[tuple[int, str, str, float]]:
+        """Find the already indexed submissions by others most similar to a file.
+
+        Args:
+            file_id (int | None): The file's row.
+            file (str): The file's name.
+            emails (str): The submitters' emails (joined with ";").
+            sig (list[int]): The file's signature.
+            keys (list[int]): The file's band keys.
+            top (int): How many matches are wanted.
+
+        Returns:
+            list[tuple[int, str, str, float]]: Each candidate's row, submission,
+            emails and similarity, most similar first.
+        """
+        # Only the most recent files of each bucket, so that code nearly everyone
+        # shares (like starter code) doesn't make every lookup scan the whole class
+        shared: Counter[int] = Counter()
+        for band, key in enumerate(keys):
+            shared.update(
+                row[0]
+                for row in self._db.execute(
+                    "SELECT f.id FROM bands b JOIN files f ON f.id = b.file_id "
+                    "WHERE b.band = ? AND b.key = ? AND f.file = ? AND f.emails != ? "
+                    "AND f.id != ? ORDER BY b.file_id DESC LIMIT ?",
+                    (band, key, file, emails, file_id, BUCKET_LIMIT),
+                )
+            )
+        # Sharing more bands means more similar, so only compare the likeliest
+        candidates = [other_id for other_id, _ in shared.most_common(top * 10)]
+
+        scored = []
+        ids = sorted(candidates)
+        for start in range(0, len(ids), 500):
+            chunk = ids[start : start + 500]
+            for other_id, submission, other_emails, blob in self._db.execute(
+                "SELECT id, submission, emails, signature FROM files "
+                f"WHERE id IN ({', '.join('?' * len(chunk))})",
+                chunk,
+            ):
+                other = array("I")
+                other.frombytes(blob)
+                scored.append(
+                    (other_id, submission, other_emails, similarity(sig, other))
+                )
+        scored.sort(key=lambda match: match[3], reverse=True)
+        return scored
+
+
+def index_submission(
+    db_path: str,
+    root: str,
+    files_needed: list[str],
+    top: int = TOP_K,
+    timeout: float = GRADING_TIMEOUT,
+) -> dict[str, list[tuple[str, str, float]]]:
+    """Add the submission under an autograder root to the index and print its matches.
+
+    The matches are printed to stdout, which only instructors see.
+
+    Args:
+        db_path (str): The SQLite database.
+        root (str): The autograder root directory.
+        files_needed (list[str]): The file names students need to submit.
+        top (int): How many matches to record per file.
+        timeout (float): How long to wait for another grader's lock on the index.
+
+    Returns:
+        dict[str, list[tuple[str, str, float]]]: Each file's matches.
+    """
+    from metadata import METADATA_FILE, SubmissionMetadata
+
+    metadata = SubmissionMetadata.read(os.path.join(root, METADATA_FILE))
+    name = f"{';'.join(metadata.emails)} {metadata.created_at}"
+    fingerprints = _fingerprints(os.path.join(root, "submission"), files_needed)
+    index = SimilarityIndex(db_path, timeout)
+    try:
+        found = index.add(name, metadata.emails, metadata.created_at, fingerprints, top)
+    finally:
+        index.close()
+    for file, matches in found.items():
+        for other, emails, score in matches:
+            print(f"Similarity: {file} is {score:.0%} similar to {emails} ({other})")
+    return found
+
+
+def _fingerprints(
+    directory: str, files_needed: list[str]
+) -> dict[str, tuple[int, list[int]]]:
+    """Compute the signature of each submitted Python file in a directory.
+
+    Args:
+        directory (str): The directory with the submitted files.
+        files_needed (list[str]): The file names students need to submit.
+
+    Returns:
+        dict[str, tuple[int, list[int]]]: Each file's number of tokens and
+        signature, by file name (missing and very short files are left out).
+    """
+    fingerprints = {}
+    for file in files_needed:
+        if file.endswith(".py"):
+            result = fingerprint(os.path.join(directory, file))
+            if result is not None:
+                fingerprints[file] = result
+    return fingerprints
+
+
+def _init_worker() -> None:
+    """Compute signatures with NumPy in a worker process, if it is installed."""
+    global numpy
+    try:
+        import numpy
+    except ImportError:
+        pass
+
+
+def _read_submission(
+    task: tuple[str, str, list[str]],
+) -> tuple[str, list[str], str, dict[str, tuple[int, list[int]]]]:
+    """Fingerprint one submission of a course export (in a worker process).
+
+    Args:
+        task (tuple[str, str, list[str]]): The export directory, the
+            submission's name and the file names students need to submit.
+
+    Returns:
+        tuple[str, list[str], str, dict[str, tuple[int, list[int]]]]: The
+        submission's name, emails, creation time and fingerprints.
+    """
+    from metadata import METADATA_FILE, SubmissionMetadata
+
+    export_dir, name, files_needed = task
+    directory = os.path.join(export_dir, name)
+    metadata = SubmissionMetadata.read(os.path.join(directory, METADATA_FILE))
+    # The files are in submission/, like /autograder, or next to the metadata
+    if os.path.isdir(os.path.join(directory, "submission")):
+        directory = os.path.join(directory, "submission")
+    return (
+        name,
+        metadata.emails,
+        metadata.created_at,
+        _fingerprints(directory, files_needed),
+    )
+
+
+def build(
+    export_dir: str,
+    db_path: str,
+    files_needed: list[str],
+    workers: int | None = None,
+    top: int = TOP_K,
+) -> int:
+    """Index every submission in a course export, oldest first.
+
+    The files are fingerprinted across a process pool, then added to the
+    index in the order they were submitted (as if graded one by one).
+
+    Args:
+        export_dir (str): The exported submissions directory.
+        db_path (str): The SQLite database.
+        files_needed (list[str]): The file names students need to submit.
+        workers (int | None): Number of worker processes (defaults to all cores).
+        top (int): How many matches to record per file.
+
+    Returns:
+        int: The number of submissions indexed.
+    """
+    names = sorted(
+        name
+        for name in os.listdir(export_dir)
+        if os.path.isfile(os.path.join(export_dir, name, "submission_metadata.json"))
+    )
+    tasks = [(export_dir, name, files_needed) for name in names]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        submissions = list(executor.map(_read_submission, tasks, chunksize=16))
+
+    submissions.sort(key=lambda submission: datetime.fromisoformat(submission[2]))
+    index = SimilarityIndex(db_path)
+    try:
+        for name, emails, created_at, fingerprints in submissions:
+            index.add(name, emails, created_at, fingerprints, top)
+    finally:
+        index.close()
+    return len(submissions)
+
+
+def main() -> None:
+    """Run the program."""
+    import jsoncodec
+
+    parser = argparse.ArgumentParser(description="Find similar submissions.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = commands.add_parser("build", help="index a course export")
+    build_parser.add_argument("export_dir", help="directory of exported submissions")
+    build_parser.add_argument("--db", required=True, help="SQLite database to update")
+    build_parser.add_argument(
+        "--source", default=".", help="directory containing config.json"
+    )
+    build_parser.add_argument(
+        "--workers", type=int, help="worker processes (default: all)"
+    )
+    build_parser.add_argument(
+        "--top", type=int, default=TOP_K, help="matches to record per file"
+    )
+
+    query_parser = commands.add_parser("query", help="show the closest matches")
+    query_parser.add_argument("submission", nargs="?", help="only this submission")
+    query_parser.add_argument("--db", required=True, help="SQLite database to read")
+    query_parser.add_argument("--top", type=int, default=20, help="matches to show")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        config = jsoncodec.read(os.path.join(args.source, "config.json"))
+        start = time.perf_counter()
+        count = build(
+            args.export_dir, args.db, config["files_needed"], args.workers, args.top
+        )
+        elapsed = time.perf_counter() - start
+        print(f"Indexed {count} submissions in {elapsed:.2f}s")
+        args.submission = None
+        args.top = 20
+
+    index = SimilarityIndex(args.db)
+    try:
+        matches = index.matches(args.submission, args.top)
+    finally:
+        index.close()
+    for file, name, emails, other, other_emails, score in matches:
+        print(f"{score:>5.0%}  {file}  {emails} ({name})  ~  {other_emails} ({other})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+This file imports the student's modules once, before the tests are discovered.
+
+Each submitted .py file is imported as `files.<name>` under an import-time
+budget, with its output captured and the working directory and sys.path
+restored afterwards. When the tests later do `from files.lab2 import *`, the
+module is already imported. If a module fails to import (or takes too long),
+a stub is installed in its place so the tests still load, and the runner
+fails the tests whose file imports it with the reason instead of running
+them. Tests that only use the other files still run.
+"""
+
+import ast
+import importlib
+import inspect
+import os
+import signal
+import sys
+import time
+import traceback
+import types
+from contextlib import redirect_stderr, redirect_stdout
+from typing import Any
+
+from bounded_output import BoundedStringIO
+
+# Default import-time budget, overridden by config.json's `import_budget_seconds`
+IMPORT_BUDGET_SECONDS = 10.0
+# The most characters of a module's import-time output kept
+IMPORT_OUTPUT_LIMIT = 2_000
+
+
+class StudentImportError(Exception):
+    """The student's code could not be imported."""
+
+
+class ImportTimeout(BaseException):
+    """Raised in the student's code when its import goes over the budget.
+
+    It isn't an Exception, so `except Exception` in the student's code doesn't stop it.
+    """
+
+
+class StudentImport:
+    """A class to hold the outcome of importing one student module.
+
+    Attributes:
+        file (str): The submitted file's name.
+        module (str): The module's name.
+        seconds (float): How long the import took.
+        output (str): What the module printed while being imported.
+        error (str | None): Why the import failed, if it did.
+    """
+
+    def __init__(self, file: str, module: str) -> None:
+        """Initialize the StudentImport instance.
+
+        Args:
+            file (str): The submitted file's name.
+            module (str): The module's name.
+        """
+        self.file = file
+        self.module = module
+        self.seconds = 0.0
+        self.output = ""
+        self.error: str | None = None
+
+
+def import_budget(config: dict[str, Any]) -> float:
+    """Return the import-time budget from config.json.
+
+    Args:
+        config (dict[str, Any]): The config.json data.
+
+    Returns:
+        float: The seconds each student module may take to import.
+    """
+    return config.get("import_budget_seconds", IMPORT_BUDGET_SECONDS)  # type: ignore
+
+
+def load_student_modules(
+    files_needed: list[str],
+    budget_seconds: float = IMPORT_BUDGET_SECONDS,
+    package: str = "files",
+) -> list[StudentImport]:
+    """Import each submitted Python file once, installing a stub if it fails.
+
+    Args:
+        files_needed (list[str]): The file names students need to submit.
+        budget_seconds (float): The seconds each module may take to import.
+        package (str): The package the tests import the student's files from.
+
+    Returns:
+        list[StudentImport]: How each import went.
+    """
+    imports = []
+    for file in files_needed:
+        stem, extension = os.path.splitext(file)
+        if extension != ".py":
+            continue
+        record = StudentImport(file, f"{package}.{stem}")
+        if not os.path.exists(os.path.join(package, file)):
+            record.error = f"{file} was not submitted"
+        else:
+            _import(record, budget_seconds)
+        if record.error is not None:
+            stub = types.ModuleType(record.module)
+            stub.__all__ = []  # type: ignore
+            sys.modules[record.module] = stub
+        imports.append(record)
+    return imports
+
+
+def failure_message(imports: list[StudentImport]) -> str | None:
+    """Explain why the student's code couldn't be imported, if it couldn't.
+
+    Args:
+        imports (list[StudentImport]): How each import (a test uses) went.
+
+    Returns:
+        str | None: The message shown on the test, or None if all imports worked.
+    """
+    errors = [record for record in imports if record.error is not None]
+    if not errors:
+        return None
+    lines = ["Your code could not be loaded, so this test wasn't run:"]
+    for record in errors:
+        lines.append(f"- {record.error}")
+        if record.output:
+            lines.append(f"  Output while loading {record.file}:\n{record.output}")
+    return "\n".join(lines)
+
+
+def imported_by(module_name: str) -> set[str] | None:
+    """Find the modules a (test) module imports, from its source.
+
+    Args:
+        module_name (str): The module's name.
+
+    Returns:
+        set[str] | None: The imported modules' names (`from files import lab2`
+        gives both `files` and `files.lab2`), or None if its source can't be read.
+    """
+    try:
+        tree = ast.parse(inspect.getsource(sys.modules[module_name]))
+    except (KeyError, OSError, TypeError, SyntaxError):
+        return None
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.add(node.module)
+            names.update(f"{node.module}.{alias.name}" for alias in node.names)
+    return names
+
+
+def _import(record: StudentImport, budget_seconds: float) -> None:
+    """Import one student module under the budget, capturing its output.
+
+    Args:
+        record (StudentImport): The module to import, updated with the outcome.
+        budget_seconds (float): The seconds the import may take.
+    """
+
+    def on_alarm(signum: int, frame: Any) -> None:
+        raise ImportTimeout()
+
+    cwd = os.getcwd()
+    path = list(sys.path)
+    output = BoundedStringIO(IMPORT_OUTPUT_LIMIT)
+    previous_handler = signal.signal(signal.SIGALRM, on_alarm)
+    # Keep interrupting every 0.1s in case the student's code catches the first one
+    signal.setitimer(signal.ITIMER_REAL, budget_seconds, 0.1)
+    start = time.perf_counter()
+    try:
+        try:
+            with redirect_stdout(output), redirect_stderr(output):
+                importlib.import_module(record.module)
+        finally:
+            # Before handling anything, so the interval can't fire again in a handler
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    except ImportTimeout:
+        record.error = (
+            f"{record.file} took longer than {budget_seconds:g}s to load "
+            f"(does it run slow code outside of functions?)"
+        )
+    except KeyboardInterrupt:
+        raise
+    except BaseException as error:  # including SystemExit from exit()
+        record.error = f"{record.file} raised {_describe(error, record.file)}"
+    finally:
+        signal.signal(signal.SIGALRM, previous_handler)
+        record.seconds = time.perf_counter() - start
+        record.output = output.getvalue()
+        os.chdir(cwd)
+        sys.path[:] = path
+
+    if record.error is not None:
+        sys.modules.pop(record.module, None)
+
+
+def _describe(error: BaseException, file: str) -> str:
+    """Describe an exception, with the line of the student's file it came from.
+
+    Args:
+        error (BaseException): The exception.
+        file (str): The student's file name.
+
+    Returns:
+        str: The description.
+    """
+    description = f"{type(error).__name__}: {error}"
+    lines = [
+        frame.lineno
+        for frame in traceback.extract_tb(error.__traceback__)
+        if os.path.basename(frame.filename) == file
+    ]
+    if lines:
+        description += f" (line {lines[-1]})"
+    return description
@@ -0,0 +1,99 @@
+"""Sample randomized test_randomized.py file
+
+The expected answers come from the oracle (see oracle.py), on a dataset
+generated for each submission, so they can't be hard-coded. These tests are
+worth 0 points until given a weight.
+"""
+
+import unittest
+
+from gradescope_utils.autograder_utils.decorators import number, visibility, weight
+
+import datasets
+from files.lab2 import *  # will be imported on submission
+from oracle import Oracle, random_dataset, submission_seed
+
+
+class TestLab2Randomized(unittest.TestCase):
+    """Class to test the student's submission on randomized data."""
+
+    BREED_FILE_NAME = "files/dog_breed_characteristics.csv"
+    DOG_FILE_NAME = "files/nyc_dogs.json"
+    DOG_COUNT = 2_000
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Set up the tests.
+
+        Runs once; the dataset is generated and indexed once per submission.
+        """
+        cls.breeds, cls.dogs = random_dataset(
+            datasets.load_csv(cls.BREED_FILE_NAME),
+            datasets.load_json(cls.DOG_FILE_NAME),
+            submission_seed(),
+            cls.DOG_COUNT,
+        )
+        cls.oracle = Oracle(cls.breeds, cls.dogs)
+        cls.names = [breed[0] for breed in cls.breeds[1:]]
+
+    @weight(0)
+    @number("10")
+    @visibility("after_due_date")
+    def test_dogs_by_breed_randomized(self) -> None:
+        """Check get_dogs_by_breed and get_names_by_breed on 20 breeds."""
+        for name in self.names[:20] + ["mix", "LABNAP"]:
+            query = name.lower() if len(name) % 2 else name.upper()
+            found = get_dogs_by_breed(self.dogs, query)
+            assert len(found) == self.oracle.count_by_breed(
+                query
+            ), f"Expected {self.oracle.count_by_breed(query)} dogs for {query!r}, found {len(found)}"
+            assert found == self.oracle.dogs_by_breed(
+                query
+            ), f"get_dogs_by_breed returned the wrong dogs for {query!r}"
+            assert get_names_by_breed(self.dogs, query) == self.oracle.names_by_breed(
+                query
+            ), f"get_names_by_breed returned the wrong names for {query!r}"
+
+    @weight(0)
+    @number("11")
+    @visibility("after_due_date")
+    def test_breed_data_randomized(self) -> None:
+        """Check get_breed_data_by_name and get_breed_data_for_dog."""
+        for name in self.names[:50] + ["LABNAPBAP"]:
+            assert get_breed_data_by_name(
+                self.breeds, name.swapcase()
+            ) == self.oracle.breed_data_by_name(
+                name
+            ), f"get_breed_data_by_name returned the wrong data for {name.swapcase()!r}"
+        for dog in self.dogs[:200]:
+            assert get_breed_data_for_dog(
+                self.breeds, dog
+            ) == self.oracle.breed_data_for_dog(
+                dog
+            ), f"get_breed_data_for_dog returned the wrong data for {dog}"
+
+    @weight(0)
+    @number("12")
+    @visibility("after_due_date")
+    def test_temperaments_randomized(self) -> None:
+        """Check get_breeds_by_temperament on several temperaments."""
+        for temperament in ["Affectionate", "Sweet", "Independent", "Angry"]:
+            found = get_breeds_by_temperament(self.breeds, temperament)
+            assert found == self.oracle.breeds_by_temperament(
+                temperament
+            ), f"get_breeds_by_temperament returned the wrong breeds for {temperament!r}"
+
+    @weight(0)
+    @number("13")
+    @visibility("after_due_date")
+    def test_zip_codes_and_breeds_randomized(self) -> None:
+        """Check list_all_zip_codes and list_breeds on every dog."""
+        zipcodes = list_all_zip_codes(self.dogs)
+        assert (
+            zipcodes == self.oracle.zip_codes()
+        ), f"Expected {len(self.oracle.zip_codes())} sorted zip codes, found {len(zipcodes)}"
+        breeds = list_breeds(self.dogs)
+        assert (
+            len(breeds) == len(self.oracle.dog_breeds())
+            and set(breeds) == self.oracle.dog_breeds()
+        ), f"Expected {len(self.oracle.dog_breeds())} different breeds, found {len(breeds)}"
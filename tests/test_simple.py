@@ -4,27 +4,24 @@ import unittest
 
 from gradescope_utils.autograder_utils.decorators import number, weight
 
+import datasets
 from files.lab2 import *  # will be imported on submission
 
 
 class TestLab2(unittest.TestCase):
     """Class to test the student's submission."""
 
-    def setUp(self) -> None:
+    BREED_FILE_NAME = "files/dog_breed_characteristics.csv"
+    DOG_FILE_NAME = "files/nyc_dogs.json"
+
+    @classmethod
+    def setUpClass(cls) -> None:
         """Set up the tests.
 
-        Runs before every test.
+        Runs once; the data is parsed once per run and shared read-only by every test.
         """
-        self.BREED_FILE_NAME = "files/dog_breed_characteristics.csv"
-        self.DOG_FILE_NAME = "files/nyc_dogs.json"
-
-        csvfile = open(self.BREED_FILE_NAME)
-        self.breeds = list(csv.reader(csvfile, delimiter=","))
-        csvfile.close()
-
-        f = open(self.DOG_FILE_NAME, "r")
-        self.dogs = json.load(f)
-        f.close()
+        cls.breeds = datasets.load_csv(cls.BREED_FILE_NAME)
+        cls.dogs = datasets.load_json(cls.DOG_FILE_NAME)
 
     @weight(10)
     @number("0")